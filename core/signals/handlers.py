@@ -1,7 +1,8 @@
 from django.dispatch import receiver
 from main.signals import order_created
+from main import notifications
 
 
 @receiver(order_created)
 def on_order_created(sender, **kwargs):
-    pass
\ No newline at end of file
+    notifications.notify_order_created(kwargs['order'])
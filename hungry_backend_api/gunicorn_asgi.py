@@ -0,0 +1,13 @@
+# ASGI deployment profile: uvicorn workers under gunicorn, serving the async
+# read views in main.async_views, with the same WEB_CONCURRENCY as the sync
+# WSGI workers. Procfile.asgi is the Procfile that deploys it; copy it over
+# Procfile to switch. The WSGI Procfile stays the default: compare the two
+# with benchmark_serving on the target dynos before switching. Persistent
+# connections are turned off under this profile, so set DB_POOL_SIZE to
+# reuse them through main.db.postgresql_pool.
+import os
+
+wsgi_app = 'hungry_backend_api.asgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+raw_env = ['ASYNC_READ_VIEWS=1']
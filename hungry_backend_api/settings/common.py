@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.replicas.PrimaryPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -143,6 +144,16 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Uploads always stream to a temporary file instead of being held in memory.
+# Image uploads are then moved to IMAGE_STAGING_STORAGE, where a celery
+# worker picks them up (see main.images), so that storage has to be shared
+# between the web and worker processes. Locally that is IMAGE_STAGING_ROOT.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_STAGING_STORAGE = 'main.models.StagingStorage'
+IMAGE_STAGING_ROOT = os.environ.get('IMAGE_STAGING_ROOT', os.path.join(BASE_DIR, 'staging'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -153,6 +164,11 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson when it's installed, the stdlib encoder otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'main.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     # 'DEFAULT_PERMISSION_CLASSES': [
     #     'rest_framework.permissions.IsAuthenticated'
     # ]
@@ -175,14 +191,71 @@ DJOSER = {
 }
 
 
-CELERY_BEAT_SCHEDULE = {
-    'notify_customers': {
-        'task': 'playground.tasks.notify_customers',
-        #'schedule': crontab(minute='*/15'), # every 15 minutes
-        'schedule': 5,
-        # the line above this line means every 5 seconds
-        'args': ['Hello World'],
+# The 'responses' cache holds serialized API responses (see main.cache).
+# LocMemCache evicts least recently used entries once MAX_ENTRIES is reached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000
+        }
+    }
+}
+
+
+# Serve the feed, post detail, category list and cart from the async views
+# in main.async_views. Only worth it under ASGI, see gunicorn_asgi.py.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+
 
+# Read replicas used by main.replicas. Each settings module adds its replica
+# aliases to DATABASES and lists them here; without any, everything reads
+# from the primary.
+DATABASE_ROUTERS = ['main.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+# Longest replication lag we expect. Clients read from the primary for this
+# long after a write.
+REPLICA_LAG_SECONDS = 5
+REPLICA_HEALTH_CHECK_SECONDS = 10
+
+
+# Where order notifications are delivered (see main.notifications)
+NOTIFICATIONS_BACKEND = 'main.notifications.ConsoleBackend'
+NOTIFICATIONS_COALESCE_SECONDS = 30
+NOTIFICATIONS_CLAIM_SECONDS = 300
+
+
+# Carts untouched for this long are deleted by the expire_stale_carts job
+CART_TTL = timedelta(days=7)
+
+
+# Post changes are handed out by main.sync once they are this old, and
+# deleted posts are reported to clients that synced within the TTL
+SYNC_SETTLE_SECONDS = 5
+SYNC_TOMBSTONE_TTL = timedelta(days=30)
+
+
+# Periodic jobs from main.jobs, each run through main.tasks.run_job
+CELERY_BEAT_SCHEDULE = {
+    'expire_stale_carts': {
+        'task': 'main.tasks.run_job',
+        'schedule': crontab(minute=0), # every hour
+        'args': ['expire_stale_carts'],
+    },
+    'mark_sold_out_posts': {
+        'task': 'main.tasks.run_job',
+        'schedule': crontab(minute='*/5'), # every 5 minutes
+        'args': ['mark_sold_out_posts'],
+    },
+    'prune_post_tombstones': {
+        'task': 'main.tasks.run_job',
+        'schedule': crontab(minute=30, hour=3), # daily
+        'args': ['prune_post_tombstones'],
     }
 }
 
@@ -9,10 +9,74 @@ SECRET_KEY = os.environ['SECRET_KEY']
 
 ALLOWED_HOSTS = ['hungry-backend-api.herokuapp.com']
 
+# Connections stay open for DB_CONN_MAX_AGE seconds between requests and are
+# checked before a request reuses them. With DB_POOL_SIZE set, each process
+# instead shares a pool of that many connections between its threads, see
+# main.db.postgresql_pool.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+if ASYNC_READ_VIEWS:
+    # Under ASGI each request runs its ORM work on a thread of its own, so a
+    # persistent connection is never reused and they pile up until Postgres
+    # refuses more (Django ticket #33497). Pool them with DB_POOL_SIZE instead.
+    DB_CONN_MAX_AGE = 0
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+
+
+def database_config(config):
+    if DB_POOL_SIZE:
+        config['ENGINE'] = 'main.db.postgresql_pool'
+        # Connections go back to the pool at the end of each request
+        config['CONN_MAX_AGE'] = 0
+        config['POOL'] = {
+            'MAX_SIZE': DB_POOL_SIZE,
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            'HEALTH_CHECK_SECONDS': 30
+        }
+    else:
+        config['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+        config['CONN_HEALTH_CHECKS'] = True
+    return config
+
+
 DATABASES = {
-    'default': dj_database_url.config()
+    'default': database_config(dj_database_url.config())
 }
 
+# Comma separated database URLs of the read replicas
+for index, url in enumerate(filter(None, os.environ.get('REPLICA_DATABASE_URLS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = database_config(dj_database_url.parse(url))
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+
+# Web and worker dynos have separate filesystems, so by default uploads are
+# staged in Cloudinary next to the media they become. That moves only the
+# resizing off the web dynos: the request still uploads the original to
+# Cloudinary before it answers, and the worker downloads it again, so on
+# Heroku it blocks web workers on uploads as much as processing them in the
+# request would. Point IMAGE_STAGING_STORAGE at a storage class the web and
+# worker processes share more cheaply (a mounted disk, or an object store
+# in the same region) to get that benefit.
+IMAGE_STAGING_STORAGE = os.environ.get('IMAGE_STAGING_STORAGE', 'main.storage.StagingCloudinaryStorage')
+
 
 REDIS_URL = os.environ['REDIS_URL']
-CELERY_BROKER_URL = REDIS_URL
\ No newline at end of file
+CELERY_BROKER_URL = REDIS_URL
+
+# Job locks and notification coalescing live in the default cache, so it
+# has to be shared between dynos too
+CACHES['default'] = {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': REDIS_URL,
+    'KEY_PREFIX': 'default'
+}
+
+# Shared between dynos so an invalidation reaches every worker. Redis should
+# run with an allkeys-lru maxmemory-policy to bound memory.
+CACHES['responses'] = {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': REDIS_URL,
+    'TIMEOUT': 60,
+    'KEY_PREFIX': 'responses'
+}
\ No newline at end of file
@@ -56,10 +56,16 @@ class PostImageInline(admin.TabularInline):
     readonly_fields = ['thumbnail']
 
     def thumbnail(self, instance):
+        thumb = next((variant for variant in instance.variants.all() if variant.name == 'thumb'), None)
+        if thumb is not None:
+            return format_html('<img src="{}" class="thumbnail" />', thumb.image.url)
         if instance.image.name != '':
-            return format_html(f'<img src="{instance.image.url}" class="thumbnail" />')
+            return format_html('<img src="{}" class="thumbnail" />', instance.image.url)
         return ''
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('variants')
+
 
 @admin.register(models.Post)
 class PostAdmin(admin.ModelAdmin):
@@ -92,15 +98,6 @@ class CategoryAdmin(admin.ModelAdmin):
     list_per_page = 20
     search_fields = ['title__istartswith']
 
-    @admin.display(ordering='posts_count')
-    def posts_count(self, category):
-        return category.posts_count
-
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            posts_count=Count('posts')
-        )
-
 @admin.register(models.Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     exclude = ['post']
@@ -147,4 +144,11 @@ class OrderAdmin(admin.ModelAdmin):
     list_per_page = 20
     search_fields = ['id__istartswith']
     autocomplete_fields = ['user_profile']
-    inlines = [OrderItemInline]
\ No newline at end of file
+    inlines = [OrderItemInline]
+
+@admin.register(models.JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'started_at', 'finished_at', 'batches', 'processed']
+    list_filter = ['name', 'status']
+    list_per_page = 20
+    readonly_fields = ['name', 'status', 'started_at', 'finished_at', 'batches', 'processed', 'error']
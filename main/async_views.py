@@ -0,0 +1,168 @@
+"""
+Async versions of the busiest GET endpoints, served instead of the viewsets
+when settings.ASYNC_READ_VIEWS is on under ASGI (see main.urls). They take
+their querysets, filters, serializers and caches from the viewsets, so the
+responses are the same, but run the queries through the async ORM so a
+worker isn't held while a slow client is being served. Other methods, and
+cursor pages of the feed, are handed to the viewsets.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+from . import replicas, views
+from .conditional import NotModified
+from .pagination import DefaultPagination
+from .renderers import FastJSONRenderer
+
+
+def render(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+class AsyncReadView:
+    viewset = None
+    # The viewset's actions, for the requests this view hands over to it
+    actions = None
+    action = None
+    # Page number pagination matching the viewset's default pages
+    pagination_class = None
+
+    @classmethod
+    def as_view(cls):
+        sync_view = cls.viewset.as_view(cls.actions)
+
+        async def view(request, **kwargs):
+            # As the router passes them, so cache keys match the viewsets'
+            kwargs = {key: str(value) for key, value in kwargs.items()}
+            self = cls()
+            if request.method != 'GET' or self.delegate(request):
+                return await sync_to_async(sync_view)(request, **kwargs)
+            return await self.get(request, **kwargs)
+
+        # The viewsets are csrf exempt too; Django 4.1's decorator can't wrap a coroutine
+        view.csrf_exempt = True
+        return view
+
+    def delegate(self, request):
+        return False
+
+    async def get(self, request, **kwargs):
+        view = self.viewset(action=self.action, action_map={'get': self.action}, args=(), kwargs=kwargs, format_kwarg=None)
+        try:
+            with replicas.replica_reads(None):
+                replica, cache_key, data = await sync_to_async(self.prepare)(view, request, kwargs)
+            if data is None:
+                with replicas.replica_reads(replica):
+                    data = await self.fetch(view, kwargs)
+                    if cache_key is not None and not view.may_be_stale():
+                        await sync_to_async(view.response_cache.set)(cache_key, data)
+            response = render(data)
+        except NotModified:
+            response = HttpResponse(status=NotModified.status_code)
+        except Exception as exc:
+            response = exception_handler(exc, {'view': view, 'args': (), 'kwargs': kwargs, 'request': request})
+            if response is None:
+                raise
+            return render(response.data, response.status_code)
+
+        # As ConditionalGetMixin.finalize_response
+        etag = getattr(view, 'etag', None)
+        if etag is not None:
+            response['ETag'] = etag
+        return response
+
+    def prepare(self, view, request, kwargs):
+        """Everything up to the queries, on the sync side: authentication, permissions, filters, ETags."""
+        view.request = view.initialize_request(request, **kwargs)
+        view.headers = {}
+        view.initial(view.request, **kwargs)
+
+        cache_key = data = None
+        response_cache = getattr(view, 'response_cache', None)
+        if response_cache is not None:
+            cache_key = response_cache.make_key(view.request, self.action, kwargs)
+            data = response_cache.get(cache_key)
+        if data is None:
+            view.async_queryset = view.filter_queryset(view.get_queryset())
+        # The replica view.initial chose, if any
+        return replicas.current_replica(), cache_key, data
+
+    async def fetch(self, view, kwargs):
+        raise NotImplementedError
+
+
+class AsyncListView(AsyncReadView):
+    action = 'list'
+
+    async def fetch(self, view, kwargs):
+        queryset = view.async_queryset
+        fast_serializer_class = getattr(view, 'fast_serializer_class', None)
+        if fast_serializer_class is not None:
+            queryset = fast_serializer_class.values(queryset)
+        if self.pagination_class is None:
+            return await self.serialize(view, [obj async for obj in queryset])
+
+        pagination = self.pagination_class()
+        request = view.request
+        paginator = pagination.django_paginator_class(queryset, pagination.get_page_size(request))
+        paginator.count = await queryset.acount()
+        page_number = pagination.get_page_number(request, paginator)
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        page.object_list = [obj async for obj in page.object_list]
+
+        pagination.page = page
+        pagination.request = request
+        data = await self.serialize(view, page.object_list)
+        return pagination.get_paginated_response(data).data
+
+    async def serialize(self, view, objects):
+        fast_serializer_class = getattr(view, 'fast_serializer_class', None)
+        if fast_serializer_class is not None:
+            return await fast_serializer_class(view.get_serializer_context()).aserialize(objects)
+        return view.get_serializer(objects, many=True).data
+
+
+class AsyncRetrieveView(AsyncReadView):
+    action = 'retrieve'
+
+    async def fetch(self, view, kwargs):
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            obj = await view.async_queryset.filter(**{view.lookup_field: kwargs[lookup_url_kwarg]}).afirst()
+        except (TypeError, ValueError, ValidationError):
+            obj = None
+        if obj is None:
+            raise NotFound()
+        view.check_object_permissions(view.request, obj)
+        return view.get_serializer(obj).data
+
+
+class PostListView(AsyncListView):
+    viewset = views.PostViewSet
+    actions = {'get': 'list', 'post': 'create'}
+    pagination_class = DefaultPagination
+
+    def delegate(self, request):
+        return views.PostViewSet.pagination_class().use_cursor(Request(request))
+
+
+class PostDetailView(AsyncRetrieveView):
+    viewset = views.PostViewSet
+    actions = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+
+
+class CategoryListView(AsyncListView):
+    viewset = views.CategoryViewSet
+    actions = {'get': 'list', 'post': 'create'}
+
+
+class CartDetailView(AsyncRetrieveView):
+    viewset = views.CartViewSet
+    actions = {'get': 'retrieve', 'delete': 'destroy'}
@@ -0,0 +1,101 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from rest_framework.response import Response
+from . import replicas
+
+
+class ResponseCache:
+    """
+    Caches serialized response data keyed on the request's normalized query
+    parameters. Every key embeds the namespace's current generation, so
+    invalidate() drops all entries at once without having to know them;
+    old entries are left to expire by TTL or be evicted as least recently used.
+    """
+
+    def __init__(self, namespace, alias='responses', timeout=DEFAULT_TIMEOUT):
+        self.namespace = namespace
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def generation_key(self):
+        return f'{self.namespace}:generation'
+
+    def generation(self):
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            # A fresh value rather than a counter, so a generation that was
+            # evicted never comes back and resurrects old entries
+            self.cache.add(self.generation_key, time.time_ns(), None)
+            generation = self.cache.get(self.generation_key)
+        return generation
+
+    def invalidate(self):
+        self.cache.set(self.generation_key, time.time_ns(), None)
+
+    def generation_age(self):
+        """Seconds since the current generation started."""
+        return (time.time_ns() - self.generation()) / 1e9
+
+    def make_key(self, request, action, kwargs):
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        signature = repr((action, request.get_host(), sorted(kwargs.items()), params))
+        digest = hashlib.md5(signature.encode()).hexdigest()
+        return f'{self.namespace}:{self.generation()}:{digest}'
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+
+post_cache = ResponseCache('posts')
+category_cache = ResponseCache('categories', timeout=60 * 60)
+
+
+class CachedResponseMixin:
+    """
+    Serves list and retrieve from a ResponseCache. The responses of views
+    using it must not depend on who is asking.
+    """
+    response_cache = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.response_cache.make_key(request, self.action, kwargs)
+        data = self.response_cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and not self.may_be_stale():
+            self.response_cache.set(key, response.data)
+        return response
+
+    def get_etag(self):
+        # The key embeds the generation, which every change to the cached rows
+        # replaces. While a replica may still be behind, an ETag could end up
+        # naming a stale response.
+        if self.may_be_stale():
+            return None
+        return self.response_cache.make_key(self.request, self.action, self.kwargs)
+
+    def may_be_stale(self):
+        # A replica can still be missing the write that started this generation
+        return (
+            replicas.reading_from_replica()
+            and self.response_cache.generation_age() < settings.REPLICA_LAG_SECONDS
+        )
@@ -0,0 +1,31 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Min
+from django.utils import timezone
+from .models import Cart, CartItem
+
+# A cart's last_activity is only rewritten once it is at least this old, so a
+# burst of edits to the same cart costs one row write rather than one per edit
+TOUCH_INTERVAL = timedelta(minutes=5)
+
+
+def touch(cart_id):
+    now = timezone.now()
+    Cart.objects \
+        .filter(pk=cart_id, last_activity__lt=now - TOUCH_INTERVAL) \
+        .update(last_activity=now)
+
+
+def expired(ttl=None):
+    """Carts with no item changes for longer than ttl, CART_TTL by default."""
+    if ttl is None:
+        ttl = settings.CART_TTL
+    return Cart.objects.filter(last_activity__lt=timezone.now() - ttl)
+
+
+def report(ttl=None):
+    """Summarize what purging expired carts would delete."""
+    carts = expired(ttl)
+    summary = carts.aggregate(carts=Count('pk'), oldest_activity=Min('last_activity'))
+    summary['items'] = CartItem.objects.filter(cart__in=carts).count()
+    return summary
@@ -0,0 +1,24 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .cache import category_cache
+from .models import Category
+
+
+def refresh_posts_count(category_ids=None):
+    """
+    Recount the posts of the given categories (all of them when None) from
+    the Category.posts through table in a single UPDATE.
+    """
+    through = Category.posts.through
+    posts_count = through.objects \
+        .filter(category_id=OuterRef('pk')) \
+        .values('category_id') \
+        .annotate(count=Count('*')) \
+        .values('count')
+
+    queryset = Category.objects.all()
+    if category_ids is not None:
+        queryset = queryset.filter(pk__in=category_ids)
+    updated = queryset.update(posts_count=Coalesce(Subquery(posts_count), 0))
+    category_cache.invalidate()
+    return updated
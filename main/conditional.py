@@ -0,0 +1,53 @@
+import hashlib
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+def make_etag(version, media_type):
+    return quote_etag(hashlib.md5(f'{version}:{media_type}'.encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    """If-None-Match comparison, which ignores weak markers."""
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return '*' in etags or etag.removeprefix('W/') in [tag.removeprefix('W/') for tag in etags]
+
+
+class ConditionalGetMixin:
+    """
+    Adds an ETag to list and retrieve responses, and answers requests whose
+    If-None-Match holds the current one with 304 before anything is queried
+    or serialized. Views supply get_etag(): a string that changes whenever
+    the response would, or None to skip the check.
+    """
+    etag_actions = ['list', 'retrieve']
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # After authentication and permissions, so a 304 reveals nothing more than a 200 would
+        self.etag = None
+        if request.method not in ['GET', 'HEAD'] or self.action not in self.etag_actions:
+            return
+        version = self.get_etag()
+        if version is not None:
+            self.etag = make_etag(version, request.accepted_media_type)
+            if etag_matches(request, self.etag):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'etag', None)
+        if etag is not None and response.status_code in [status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED]:
+            response['ETag'] = etag
+        return response
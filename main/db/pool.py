@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of at most max_size connections. Idle connections
+    are handed out most recently used first, so the rest can be closed by
+    the server's idle timeout when traffic drops. One that has been idle for
+    longer than health_check_seconds is checked before it is reused.
+
+    The pool doesn't know what a connection is. It is given callables to
+    open one, check that one still works, reset one that is returned, and
+    close one.
+    """
+
+    # Checkouts that wait longer than this are logged
+    slow_checkout_seconds = 0.1
+
+    def __init__(self, connect, is_usable, reset, close, max_size=10, timeout=5, health_check_seconds=30):
+        self.connect = connect
+        self.is_usable = is_usable
+        self.reset = reset
+        self.close = close
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_seconds = health_check_seconds
+
+        self._condition = threading.Condition()
+        # (connection, returned at), most recently returned last
+        self._idle = []
+        # Connections checked out, or being opened to be
+        self._in_use = 0
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def checkout(self):
+        start = time.monotonic()
+        with self._condition:
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f'No connection became free within {self.timeout}s')
+                self._condition.wait(remaining)
+
+            if self._idle:
+                connection, returned_at = self._idle.pop()
+            else:
+                connection, returned_at = None, None
+            # Counted from here on, so concurrent checkouts can't overshoot max_size
+            self._in_use += 1
+            self._record_wait(time.monotonic() - start)
+
+        if connection is not None and time.monotonic() - returned_at > self.health_check_seconds:
+            if not self.is_usable(connection):
+                # Replaced below, so its slot stays taken
+                self._close_quietly(connection)
+                connection = None
+        if connection is None:
+            try:
+                connection = self.connect()
+            except Exception:
+                self._release_slot()
+                raise
+        return connection
+
+    def checkin(self, connection, discard=False):
+        if not discard:
+            try:
+                self.reset(connection)
+            except Exception:
+                logger.warning('Could not reset a pooled connection, closing it', exc_info=True)
+                discard = True
+        if discard:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._in_use -= 1
+            self._condition.notify()
+
+    def _discard(self, connection):
+        self._close_quietly(connection)
+        self._release_slot()
+
+    def _close_quietly(self, connection):
+        try:
+            self.close(connection)
+        except Exception:
+            pass
+
+    def _release_slot(self):
+        with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+
+    def _record_wait(self, wait):
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        if wait > self.slow_checkout_seconds:
+            logger.warning('Waited %.0fms for a pooled connection, %s in use', wait * 1000, self._in_use)
+
+    def stats(self):
+        with self._condition:
+            idle = len(self._idle)
+            return {
+                'size': self._in_use + idle,
+                'in_use': self._in_use,
+                'idle': idle,
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_avg_ms': self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+                'wait_max_ms': self.wait_max * 1000
+            }
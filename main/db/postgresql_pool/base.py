@@ -0,0 +1,86 @@
+"""
+PostgreSQL backend that keeps connections in a per-process ConnectionPool.
+Django closes a connection at the end of each request (CONN_MAX_AGE = 0),
+which here hands it back to the pool instead of closing it, so threaded
+and async workers share a bounded set of open connections.
+
+Configured with a POOL entry next to the usual settings:
+
+    'POOL': {'MAX_SIZE': 10, 'TIMEOUT': 5, 'HEALTH_CHECK_SECONDS': 30}
+"""
+import threading
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+from main.db.pool import ConnectionPool
+
+Database = base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect(conn_params, options):
+    # What the postgresql backend does for each new connection
+    connection = Database.connect(**conn_params)
+    isolation_level = options.get('isolation_level')
+    if isolation_level is not None and isolation_level != connection.isolation_level:
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def ping(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except Database.Error:
+        return False
+
+
+def reset(connection):
+    if connection.closed:
+        raise Database.InterfaceError('connection already closed')
+    if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+
+
+def close(connection):
+    connection.close()
+
+
+def pool_stats():
+    """Checkout wait and size metrics of every pool in this process."""
+    return {alias: pool.stats() for alias, pool in _pools.items()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = self.settings_dict.get('POOL', {})
+                connect_options = dict(self.settings_dict['OPTIONS'])
+                _pools[self.alias] = ConnectionPool(
+                    connect=lambda: connect(conn_params, connect_options),
+                    is_usable=ping,
+                    reset=reset,
+                    close=close,
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 5),
+                    health_check_seconds=options.get('HEALTH_CHECK_SECONDS', 30)
+                )
+            return _pools[self.alias]
+
+    @base.async_unsafe
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).checkout()
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    @base.async_unsafe
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # A connection that was closed or can't be reset is dropped
+                _pools[self.alias].checkin(self.connection)
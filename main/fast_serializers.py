@@ -0,0 +1,196 @@
+"""
+Read-only fast path for lists of posts. DRF builds every field of every
+nested serializer for every row; here the output of PostSerializer and
+SimplePostSerializer is assembled straight from .values() rows, or from
+already loaded instances, with each field's conversion looked up once.
+The JSON is the same byte for byte, which test_fast_serializers checks, so
+a field added to those serializers has to be added here too.
+"""
+from collections import defaultdict
+from functools import lru_cache
+from rest_framework import serializers
+from rest_framework.response import Response
+from . import images, serializers as main_serializers
+from .models import Category, Ingredient, Post, PostImage, PostImageVariant
+
+
+# Fields whose representation is the value the database returns
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField
+)
+
+
+@lru_cache(maxsize=None)
+def model_fields(serializer_class):
+    """
+    Map each field of the serializer that is a plain model column to its
+    to_representation, or to None when the column value is used as is.
+    """
+    model = serializer_class.Meta.model
+    columns = {field.name for field in model._meta.concrete_fields if not field.is_relation}
+    compiled = {}
+    for name, field in serializer_class().fields.items():
+        if field.source not in columns or isinstance(field, (serializers.FileField, serializers.SerializerMethodField)):
+            continue
+        compiled[name] = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_representation
+    return compiled
+
+
+def represent(row, fields):
+    return {
+        name: row[name] if convert is None or row[name] is None else convert(row[name])
+        for name, convert in fields.items()
+    }
+
+
+class FastPostSerializer:
+    """
+    Stands in for PostSerializer(many=True) on lists. Use values() to turn
+    the list's queryset into rows, then serialize() a page of them; the
+    images, ingredients and categories take one query each, like the
+    viewsets' prefetches.
+    """
+    rating_fields = [f'rating_{rating}_count' for rating in range(1, 6)]
+
+    def __init__(self, context=None):
+        self.fields = model_fields(main_serializers.PostSerializer)
+        self.ingredient_fields = model_fields(main_serializers.PostIngredientSerializer)
+        self.images = ImageRepresentation(context)
+
+    @classmethod
+    def values(cls, queryset):
+        columns = [*model_fields(main_serializers.PostSerializer), 'user', 'user__user__username', 'user__image', *cls.rating_fields]
+        return queryset \
+            .select_related(None) \
+            .prefetch_related(None) \
+            .values(*columns, *queryset.query.annotations)
+
+    # Each query is the one the viewsets' prefetch_related runs, so children
+    # come back in the same order
+
+    def images_queryset(self, post_ids):
+        return PostImage.objects.filter(post__in=post_ids).values_list('id', 'post_id', 'image', 'status')
+
+    def variants_queryset(self, image_ids):
+        return PostImageVariant.objects.filter(post_image__in=image_ids).values_list('post_image_id', 'name', 'width', 'image')
+
+    def ingredients_queryset(self, post_ids):
+        return Ingredient.objects.filter(post__in=post_ids).values('post_id', *self.ingredient_fields)
+
+    def categories_queryset(self, post_ids):
+        return Category.posts.through.objects \
+            .filter(post__in=post_ids) \
+            .order_by(*[f'category__{field}' for field in Category._meta.ordering]) \
+            .values_list('post_id', 'category_id')
+
+    def serialize(self, rows):
+        rows = list(rows)
+        post_ids = [row['id'] for row in rows]
+        post_images = list(self.images_queryset(post_ids))
+        return self.build(rows, {
+            'images': post_images,
+            'variants': list(self.variants_queryset([image[0] for image in post_images])),
+            'ingredients': list(self.ingredients_queryset(post_ids)),
+            'categories': list(self.categories_queryset(post_ids))
+        })
+
+    async def aserialize(self, rows):
+        post_ids = [row['id'] for row in rows]
+        post_images = [image async for image in self.images_queryset(post_ids)]
+        return self.build(rows, {
+            'images': post_images,
+            'variants': [variant async for variant in self.variants_queryset([image[0] for image in post_images])],
+            'ingredients': [ingredient async for ingredient in self.ingredients_queryset(post_ids)],
+            'categories': [category async for category in self.categories_queryset(post_ids)]
+        })
+
+    def build(self, rows, children):
+        variants = defaultdict(list)
+        for post_image_id, name, width, image in children['variants']:
+            variants[post_image_id].append((name, width, image))
+        post_images = defaultdict(list)
+        for image_id, post_id, image, status in children['images']:
+            post_images[post_id].append(self.images.to_representation(image_id, image, status, variants[image_id]))
+        ingredients = defaultdict(list)
+        for ingredient in children['ingredients']:
+            ingredients[ingredient['post_id']].append(represent(ingredient, self.ingredient_fields))
+        categories = defaultdict(list)
+        for post_id, category_id in children['categories']:
+            categories[post_id].append(category_id)
+
+        posts = []
+        for row in rows:
+            post = represent(row, self.fields)
+            distance = row.get('distance')
+            post['distance'] = round(distance, 2) if distance is not None else None
+            post['ingredients'] = ingredients[row['id']]
+            post['user'] = row['user']
+            post['user_info'] = {'username': row['user__user__username'], 'image': row['user__image'] or ''}
+            post['images'] = post_images[row['id']]
+            post['categories'] = categories[row['id']]
+            post['rating_histogram'] = {rating: row[f'rating_{rating}_count'] for rating in range(1, 6)}
+            posts.append({name: post[name] for name in main_serializers.PostSerializer.Meta.fields})
+        return posts
+
+
+class ImageRepresentation:
+    """PostImageSerializer output from an image's id, file name, status and (name, width, file name) variants."""
+
+    def __init__(self, context=None):
+        self.request = (context or {}).get('request')
+        self.image_storage = PostImage._meta.get_field('image').storage
+        self.variant_storage = PostImageVariant._meta.get_field('image').storage
+
+    def url(self, storage, name):
+        # As a DRF FileField outputs it
+        if not name:
+            return None
+        url = storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    def to_representation(self, image_id, image, status, variants):
+        variant_urls = [(name, self.url(self.variant_storage, file_name), width) for name, width, file_name in variants]
+        return {
+            'id': image_id,
+            'image': self.url(self.image_storage, image),
+            'status': status,
+            'variants': {name: url for name, url, _ in variant_urls},
+            'srcset': images.format_srcset([(url, width) for _, url, width in variant_urls])
+        }
+
+
+class FastSimplePostSerializer:
+    """Stands in for SimplePostSerializer on posts whose images__variants are prefetched."""
+
+    def __init__(self, context=None):
+        self.fields = model_fields(main_serializers.SimplePostSerializer)
+        self.images = ImageRepresentation(context)
+
+    def to_representation(self, post: Post):
+        data = represent(post.__dict__, self.fields)
+        data['images'] = [
+            self.images.to_representation(
+                image.id, image.image.name, image.status,
+                [(variant.name, variant.width, variant.image.name) for variant in image.variants.all()]
+            )
+            for image in post.images.all()
+        ]
+        return {name: data[name] for name in main_serializers.SimplePostSerializer.Meta.fields}
+
+
+class FastPostListMixin:
+    """Serves list() through FastPostSerializer instead of the viewset's serializer."""
+    fast_serializer_class = FastPostSerializer
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.fast_serializer_class.values(self.filter_queryset(self.get_queryset()))
+        serializer = self.fast_serializer_class(self.get_serializer_context())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
@@ -0,0 +1,125 @@
+"""
+The feed's read model: one FeedPost per post holding its PostSerializer
+output as JSON, so a feed page is the filtered posts joined to their
+documents by primary key rather than a query per child relation. Each
+document records the post's last_update, which the signal handlers move
+on every change to the post or its children; a document that no longer
+matches is rebuilt while the page is served, so a stale one is never
+returned, and stored again unless the page was read from a replica.
+Documents are also refreshed when a change commits, and rebuild_feed
+rebuilds them all.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+from rest_framework.utils import encoders
+from . import replicas
+from .fast_serializers import FastPostSerializer, ImageRepresentation, model_fields
+from .models import FeedPost, Post
+from .serializers import PostSerializer
+
+
+class StoredImages:
+    """Keeps each image as [id, file name, status, variants]; their URLs depend on the request."""
+
+    def to_representation(self, image_id, image, status, variants):
+        return [image_id, image, status, [list(variant) for variant in variants]]
+
+
+class DocumentSerializer(FastPostSerializer):
+
+    def __init__(self):
+        super().__init__()
+        self.images = StoredImages()
+
+
+def build_documents(post_ids):
+    """Return a FeedPost, unsaved, for each of the posts that still exists."""
+    rows = list(DocumentSerializer.values(Post.objects.filter(pk__in=post_ids)))
+    entries = []
+    for row, post in zip(rows, DocumentSerializer().serialize(rows)):
+        # Depends on the query
+        del post['distance']
+        # As the JSON renderer would encode it, so Decimals come back as the floats it writes
+        entries.append(FeedPost(post_id=row['id'], document=json.dumps(post, cls=encoders.JSONEncoder), last_update=row['last_update']))
+    return entries
+
+
+def save_documents(entries):
+    """Insert the documents, replacing any already stored for the same posts."""
+    conflict = {'update_conflicts': True, 'update_fields': ['document', 'last_update']}
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+    if connections[router.db_for_write(FeedPost)].features.supports_update_conflicts_with_target:
+        conflict['unique_fields'] = ['post']
+    FeedPost.objects.bulk_create(entries, **conflict)
+
+
+def refresh(post_ids, save=True):
+    """
+    Rebuild the documents of the given posts and return them by post id.
+    With save=False they are only built, for rows read from a replica that
+    may be behind the primary the documents are stored on.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+    entries = build_documents(post_ids)
+    if save:
+        save_documents(entries)
+    return {entry.post_id: entry for entry in entries}
+
+
+def refresh_on_commit(posts):
+    """Refresh the posts in the queryset once the transaction changing them commits."""
+    transaction.on_commit(lambda: refresh(posts.values_list('pk', flat=True)))
+
+
+class FeedSerializer:
+    """
+    Stands in for FastPostSerializer on the feed. values() joins each post
+    to its document; serialize() rebuilds the documents that are missing or
+    out of date, then adds what depends on the request: the distance from
+    the searched point and the image URLs.
+    """
+
+    def __init__(self, context=None):
+        self.images = ImageRepresentation(context)
+
+    @classmethod
+    def values(cls, queryset):
+        # The model's columns too, which cursor pages read their positions from
+        columns = [*model_fields(PostSerializer), 'feed_entry__document', 'feed_entry__last_update']
+        return queryset \
+            .select_related(None) \
+            .prefetch_related(None) \
+            .values(*columns, *queryset.query.annotations)
+
+    def stale(self, rows):
+        return [row['id'] for row in rows if row['feed_entry__last_update'] != row['last_update']]
+
+    def refresh(self, rows):
+        return refresh(self.stale(rows), save=not replicas.reading_from_replica())
+
+    def serialize(self, rows):
+        rows = list(rows)
+        return self.build(rows, self.refresh(rows))
+
+    async def aserialize(self, rows):
+        return self.build(rows, await sync_to_async(self.refresh)(rows))
+
+    def build(self, rows, refreshed):
+        posts = []
+        for row in rows:
+            entry = refreshed.get(row['id'])
+            document = entry.document if entry is not None else row['feed_entry__document']
+            if document is None:
+                # Deleted while the page was being served
+                continue
+            post = json.loads(document)
+            distance = row.get('distance')
+            post['distance'] = round(distance, 2) if distance is not None else None
+            post['images'] = [self.images.to_representation(*image) for image in post['images']]
+            # JSON object keys are strings
+            post['rating_histogram'] = {int(rating): count for rating, count in post['rating_histogram'].items()}
+            posts.append({name: post[name] for name in PostSerializer.Meta.fields})
+        return posts
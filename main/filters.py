@@ -1,5 +1,7 @@
 from django_filters.rest_framework import FilterSet
+from rest_framework.filters import OrderingFilter, SearchFilter
 from .models import Post
+from . import search
 
 class PostFilter(FilterSet):
     class Meta:
@@ -14,4 +16,33 @@ class PostFilter(FilterSet):
             # 'location': [],
             # 'last_update': []
 
-        }
\ No newline at end of file
+        }
+
+
+
+class PostOrderingFilter(OrderingFilter):
+    """
+    Only allows ordering by `distance` when the queryset was narrowed by a
+    radius search and carries the distance annotation.
+    """
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        fields = super().remove_invalid_fields(queryset, fields, view, request)
+        if 'distance' not in queryset.query.annotations:
+            fields = [term for term in fields if term.lstrip('-') != 'distance']
+        return fields
+
+
+
+
+class PostSearchFilter(SearchFilter):
+    """
+    Answers `?search=` from the post search index instead of icontains
+    scans. Every word has to match a title, description or ingredient term.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        return search.search_posts(queryset, search_terms, match_all=True)
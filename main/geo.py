@@ -0,0 +1,126 @@
+import math
+from functools import reduce
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+# Geohash cells are stored at this precision (~5m x 5m). Radius searches
+# match on a shorter prefix picked from the size of the search box.
+GEOHASH_PRECISION = 9
+MAX_SEARCH_CELLS = 16
+
+EARTH_RADIUS_MILES = 3959  #earth's mean radius in miles
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            value, value_range = longitude, lon_range
+        else:
+            value, value_range = latitude, lat_range
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits = bits << 1
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    """Return the (height, width) in degrees of a geohash cell."""
+    total_bits = precision * 5
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def bounding_box(lat, lon, radius):
+    delta_lat = radius / EARTH_RADIUS_MILES * 180 / math.pi
+    delta_lon = delta_lat / max(math.cos(math.radians(lat)), 1e-12)
+
+    min_lat = max(lat - delta_lat, -90.0)
+    max_lat = min(lat + delta_lat, 90.0)
+    min_lon = max(lon - delta_lon, -180.0)
+    max_lon = min(lon + delta_lon, 180.0)
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def _frange(start, stop, step):
+    value = start
+    while value < stop:
+        yield value
+        value += step
+    yield stop
+
+
+def covering_cells(lat, lon, radius):
+    """
+    Return the geohash prefixes of every cell that intersects the bounding
+    box of the search circle, using the finest precision that keeps the
+    number of cells under MAX_SEARCH_CELLS.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
+
+    precision = GEOHASH_PRECISION
+    while precision > 1:
+        height, width = cell_size(precision)
+        rows = math.ceil((max_lat - min_lat) / height) + 1
+        cols = math.ceil((max_lon - min_lon) / width) + 1
+        if rows * cols <= MAX_SEARCH_CELLS:
+            break
+        precision -= 1
+
+    height, width = cell_size(precision)
+    cells = set()
+    for cell_lat in _frange(min_lat, max_lat, height):
+        for cell_lon in _frange(min_lon, max_lon, width):
+            cells.add(encode_geohash(cell_lat, cell_lon, precision))
+    return sorted(cells)
+
+
+def cells_filter(cells):
+    return reduce(lambda x, y: x | y, [Q(geohash__startswith=cell) for cell in cells])
+
+
+def haversine_distance(lat, lon):
+    """Database expression for the great-circle distance in miles to (lat, lon)."""
+    post_lat = Radians(Cast(F('latitude'), FloatField()))
+    post_lon = Radians(Cast(F('longitude'), FloatField()))
+    lat = math.radians(lat)
+    lon = math.radians(lon)
+
+    a = (
+        Power(Sin((post_lat - lat) / 2), 2)
+        + Cos(post_lat) * math.cos(lat) * Power(Sin((post_lon - lon) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_MILES * ASin(Sqrt(a), output_field=FloatField())
+
+
+def within_radius(queryset, lat, lon, radius):
+    """
+    Narrow the queryset to the geohash cells around (lat, lon) and cut the
+    candidates down to the exact radius. Adds a `distance` annotation.
+    """
+    return queryset \
+        .filter(cells_filter(covering_cells(lat, lon, radius))) \
+        .annotate(distance=haversine_distance(lat, lon)) \
+        .filter(distance__lte=radius)
@@ -0,0 +1,153 @@
+import logging
+from io import BytesIO
+from os.path import basename, splitext
+from typing import NamedTuple
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+from .cache import post_cache
+from .models import Post, PostImage, PostImageVariant, UserProfile
+from . import sync
+
+logger = logging.getLogger(__name__)
+
+class ImageVariant(NamedTuple):
+    name: str
+    # Longest side in pixels
+    max_size: int
+
+
+# Every PostImage gets one WebP copy per registered variant
+VARIANTS = {}
+
+
+def register_variant(name, max_size):
+    VARIANTS[name] = ImageVariant(name, max_size)
+
+
+register_variant('thumb', 200)
+register_variant('card', 400)
+register_variant('full', 1600)
+
+PROFILE_IMAGE_SIZE = 512
+WEBP_QUALITY = 80
+
+
+def open_image(file):
+    image = Image.open(file)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ['RGB', 'RGBA']:
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    return image
+
+
+def resize(image, max_size):
+    """Return a WebP ContentFile no larger than max_size on either side."""
+    image = image.copy()
+    image.thumbnail((max_size, max_size))
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=WEBP_QUALITY)
+    return ContentFile(buffer.getvalue()), image.size
+
+
+def variant_name(path, name):
+    return f'{splitext(basename(path))[0]}_{name}.webp'
+
+
+def generate_variants(post_image, source):
+    """Replace the variants of post_image with ones made from the source file."""
+    image = open_image(source)
+    variants = []
+    for variant in VARIANTS.values():
+        content, (width, height) = resize(image, variant.max_size)
+        stored = PostImageVariant(post_image=post_image, name=variant.name, width=width, height=height)
+        stored.image.save(variant_name(source.name, variant.name), content, save=False)
+        variants.append(stored)
+
+    with transaction.atomic():
+        post_image.variants.all().delete()
+        PostImageVariant.objects.bulk_create(variants)
+
+
+def process_post_image(post_image_id):
+    post_image = PostImage.objects.filter(pk=post_image_id).first()
+    if post_image is None or not post_image.staged_image:
+        return
+
+    staged = post_image.staged_image
+    try:
+        with staged.open('rb'):
+            generate_variants(post_image, staged)
+            staged.seek(0)
+            post_image.image.save(basename(staged.name), staged, save=False)
+    except ConnectionError:
+        # Storage unreachable for now: the task retries
+        raise
+    except (OSError, ValueError):
+        logger.exception('Could not process post image %s', post_image_id)
+        # Saved through the model so the signal handlers see the change
+        post_image.status = PostImage.STATUS_FAILED
+        post_image.staged_image = ''
+        post_image.save(update_fields=['status', 'staged_image'])
+        staged.storage.delete(staged.name)
+        return
+
+    post_image.status = PostImage.STATUS_READY
+    post_image.staged_image = ''
+    post_image.save()
+    staged.storage.delete(staged.name)
+
+
+def backfill_variants(post_image):
+    """Generate the variants of an image that was stored before they existed."""
+    try:
+        with post_image.image.open('rb'):
+            generate_variants(post_image, post_image.image)
+    except ConnectionError:
+        raise
+    except (OSError, ValueError):
+        logger.exception('Could not generate variants for post image %s', post_image.id)
+        return False
+    # Nothing was saved through the model, so no signal handler saw the change
+    sync.touch_posts(Post.objects.filter(pk=post_image.post_id))
+    transaction.on_commit(post_cache.invalidate)
+    return True
+
+
+def srcset(post_image, absolute_url=None):
+    """Return the HTML srcset of the image's variants, narrowest first."""
+    urls = [(variant.image.url, variant.width) for variant in post_image.variants.all()]
+    if absolute_url is not None:
+        urls = [(absolute_url(url), width) for url, width in urls]
+    return format_srcset(urls)
+
+
+def format_srcset(urls):
+    """Format (url, width) pairs as a srcset, narrowest first."""
+    # Sources narrower than a variant aren't upscaled, so several variants can
+    # share a width, which a srcset may only list once
+    by_width = {}
+    for url, width in urls:
+        by_width.setdefault(width, url)
+    return ', '.join(f'{url} {width}w' for width, url in sorted(by_width.items()))
+
+
+def process_profile_image(user_profile_id):
+    user_profile = UserProfile.objects.filter(pk=user_profile_id).first()
+    if user_profile is None or not user_profile.staged_image:
+        return
+
+    staged = user_profile.staged_image
+    try:
+        with staged.open('rb'):
+            content, _ = resize(open_image(staged), PROFILE_IMAGE_SIZE)
+    except ConnectionError:
+        raise
+    except (OSError, ValueError):
+        logger.exception('Could not process profile image %s', user_profile_id)
+        return
+
+    user_profile.image.save(variant_name(staged.name, 'profile'), content, save=False)
+    user_profile.staged_image = ''
+    user_profile.save(update_fields=['image', 'staged_image'])
+    staged.storage.delete(staged.name)
@@ -0,0 +1,127 @@
+import logging
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+from . import carts
+from .cache import post_cache
+from .models import Cart, JobRun, Post, PostTombstone
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    A periodic maintenance job. Subclasses return the rows to work on from
+    queryset() and handle one batch of primary keys at a time in process().
+    Batches are read by keyset over the primary key, so each one is a short
+    indexed range scan no matter how far the run has got.
+    """
+    name = None
+    batch_size = 500
+    # Longest a run may hold the lock if its worker dies without releasing it
+    lock_timeout = 15 * 60
+
+    def queryset(self):
+        raise NotImplementedError
+
+    def process(self, pks):
+        """Handle one batch and return how many rows were processed."""
+        raise NotImplementedError
+
+    def finish(self, run):
+        pass
+
+    @property
+    def lock_key(self):
+        return f'jobs:lock:{self.name}'
+
+    def run(self):
+        """Run the job unless another run holds the lock. Returns the JobRun, or None when skipped."""
+        token = uuid4().hex
+        if not cache.add(self.lock_key, token, self.lock_timeout):
+            logger.info('Job %s is already running, skipping', self.name)
+            return None
+
+        run = JobRun.objects.create(name=self.name)
+        try:
+            last_pk = None
+            while True:
+                queryset = self.queryset().order_by('pk')
+                if last_pk is not None:
+                    queryset = queryset.filter(pk__gt=last_pk)
+                pks = list(queryset.values_list('pk', flat=True)[:self.batch_size])
+                if not pks:
+                    break
+                run.processed += self.process(pks)
+                run.batches += 1
+                last_pk = pks[-1]
+            self.finish(run)
+            run.status = JobRun.STATUS_SUCCEEDED
+        except Exception as e:
+            run.status = JobRun.STATUS_FAILED
+            run.error = repr(e)
+            raise
+        finally:
+            run.finished_at = timezone.now()
+            run.save()
+            if cache.get(self.lock_key) == token:
+                cache.delete(self.lock_key)
+            logger.info('Job %s finished: %s rows in %s batches', self.name, run.processed, run.batches)
+
+        return run
+
+
+class ExpireStaleCartsJob(Job):
+    name = 'expire_stale_carts'
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+
+    def queryset(self):
+        return carts.expired(self.ttl)
+
+    def process(self, pks):
+        # Filtered again, so a cart that saw activity since the batch was read is kept
+        _, deleted = self.queryset().filter(pk__in=pks).delete()
+        return deleted.get(Cart._meta.label, 0)
+
+
+class MarkSoldOutPostsJob(Job):
+    # Flips sold_out on the posts where it disagrees with their servings and
+    # ready time, so sold out posts that are available again come back too
+    name = 'mark_sold_out_posts'
+
+    def queryset(self):
+        unavailable = Post.unavailable()
+        return Post.objects.filter((Q(sold_out=False) & unavailable) | (Q(sold_out=True) & ~unavailable))
+
+    def process(self, pks):
+        # Filtered again, so a post that changed since the batch was read is left alone
+        return self.queryset().filter(pk__in=pks).update(
+            sold_out=Case(When(sold_out=True, then=Value(False)), default=Value(True)),
+            last_update=timezone.now()
+        )
+
+    def finish(self, run):
+        if run.processed:
+            post_cache.invalidate()
+
+
+class PruneTombstonesJob(Job):
+    name = 'prune_post_tombstones'
+
+    def queryset(self):
+        return PostTombstone.objects.filter(deleted_at__lt=timezone.now() - settings.SYNC_TOMBSTONE_TTL)
+
+    def process(self, pks):
+        PostTombstone.objects.filter(pk__in=pks).delete()
+        return len(pks)
+
+
+JOBS = {job.name: job for job in [ExpireStaleCartsJob, MarkSoldOutPostsJob, PruneTombstonesJob]}
+
+
+def run_job(name):
+    return JOBS[name]().run()
@@ -0,0 +1,35 @@
+from django.db.models import Count, Q
+from django.core.management.base import BaseCommand
+from main.models import PostImage
+from main import images
+
+
+class Command(BaseCommand):
+    help = 'Generates the registered image variants for post images that are missing any'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        names = list(images.VARIANTS)
+        missing = PostImage.objects \
+            .exclude(image='') \
+            .annotate(variant_count=Count('variants', filter=Q(variants__name__in=names))) \
+            .filter(variant_count__lt=len(names)) \
+            .order_by('pk')
+
+        done = failed = 0
+        last_pk = 0
+        while True:
+            batch = list(missing.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            for post_image in batch:
+                if images.backfill_variants(post_image):
+                    done += 1
+                else:
+                    failed += 1
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Processed up to post image {last_pk}')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {done} images, {failed} failed'))
@@ -0,0 +1,90 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from main import feed
+from main.fast_serializers import FastPostSerializer
+from main.models import Category, Ingredient, Post, PostImage, PostImageVariant
+from main.serializers import PostSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Times PostSerializer against FastPostSerializer and the feed documents '
+        'of FeedSerializer on feed pages of sample posts. The sample rows are '
+        'rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            post_ids = self.create_posts(max(options['sizes']))
+            feed.refresh(post_ids)
+            context = {'request': RequestFactory().get('/main/posts/')}
+            for size in options['sizes']:
+                queryset = Post.objects \
+                    .select_related('user__user') \
+                    .prefetch_related('images__variants', 'ingredients', 'categories') \
+                    .filter(pk__in=post_ids[:size])
+
+                def drf():
+                    return JSONRenderer().render(PostSerializer(queryset, many=True, context=context).data)
+
+                def fast():
+                    return JSONRenderer().render(FastPostSerializer(context).serialize(FastPostSerializer.values(queryset)))
+
+                def documents():
+                    return JSONRenderer().render(feed.FeedSerializer(context).serialize(feed.FeedSerializer.values(queryset)))
+
+                if not drf() == fast() == documents():
+                    self.stdout.write(self.style.ERROR(f'{size} rows: outputs differ'))
+                drf_time = self.best_time(drf, options['repeat'])
+                fast_time = self.best_time(fast, options['repeat'])
+                documents_time = self.best_time(documents, options['repeat'])
+                self.stdout.write(
+                    f'{size} rows: PostSerializer {drf_time * 1000:.1f}ms, '
+                    f'FastPostSerializer {fast_time * 1000:.1f}ms ({drf_time / fast_time:.1f}x faster), '
+                    f'FeedSerializer {documents_time * 1000:.1f}ms ({drf_time / documents_time:.1f}x faster)'
+                )
+            transaction.set_rollback(True)
+
+    def best_time(self, function, repeat):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def create_posts(self, count):
+        user_profile = get_user_model().objects.create(username='benchmark_serializers').userprofile
+        categories = Category.objects.bulk_create([Category(title=f'Benchmark {index}') for index in range(3)])
+        posts = Post.objects.bulk_create([
+            Post(
+                title=f'Benchmark post {index}', description='Slow cooked and hand made', delivery=True,
+                pick_up=index % 2 == 0, price='9.50', ready_date_time='2030-01-01T12:00:00Z',
+                servings_available=10, location='Somewhere', latitude='34.465037', longitude='-110.091227',
+                user=user_profile
+            )
+            for index in range(count)
+        ])
+        post_images = PostImage.objects.bulk_create([
+            PostImage(post=post, image=f'posts/images/benchmark_{post.pk}.jpg') for post in posts
+        ])
+        PostImageVariant.objects.bulk_create([
+            PostImageVariant(post_image=post_image, name=name, width=width, height=width, image=f'posts/images/benchmark_{post_image.pk}_{name}.webp')
+            for post_image in post_images
+            for name, width in [('thumb', 200), ('card', 400), ('full', 1600)]
+        ])
+        Ingredient.objects.bulk_create([
+            Ingredient(post=post, name=name) for post in posts for name in ['Flour', 'Salt', 'Water']
+        ])
+        Category.posts.through.objects.bulk_create([
+            Category.posts.through(category=category, post=post) for post in posts for category in categories[:2]
+        ])
+        return [post.pk for post in posts]
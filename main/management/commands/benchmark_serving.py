@@ -0,0 +1,54 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures requests per second against running servers, e.g. the WSGI and '
+        'the ASGI profile started with the same WEB_CONCURRENCY'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('servers', nargs='+', help='Base URLs such as http://localhost:8000')
+        parser.add_argument('--path', action='append', dest='paths', help='Defaults to the feed, categories and a post')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10)
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/main/posts/', '/main/categories/', '/main/posts/?page=2']
+        for server in options['servers']:
+            for path in paths:
+                self.benchmark(server.rstrip('/') + path, options['concurrency'], options['duration'])
+
+    def benchmark(self, url, concurrency, duration):
+        deadline = time.monotonic() + duration
+
+        def client():
+            latencies, errors = [], 0
+            while time.monotonic() < deadline:
+                start = time.monotonic()
+                try:
+                    with urlopen(url, timeout=30) as response:
+                        response.read()
+                    latencies.append(time.monotonic() - start)
+                except (URLError, OSError):
+                    errors += 1
+            return latencies, errors
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(lambda _: client(), range(concurrency)))
+
+        latencies = sorted(latency for result in results for latency in result[0])
+        errors = sum(result[1] for result in results)
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f'{url}: no successful requests, {errors} errors'))
+            return
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+        self.stdout.write(
+            f'{url}: {len(latencies) / duration:.1f} req/s, '
+            f'p50 {statistics.median(latencies) * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms, {errors} errors'
+        )
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from main import carts
+from main.jobs import ExpireStaleCartsJob
+
+
+class Command(BaseCommand):
+    help = 'Deletes carts whose items have not changed within the cart TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-days', type=float, help='Overrides settings.CART_TTL')
+        parser.add_argument('--batch-size', type=int, default=ExpireStaleCartsJob.batch_size)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        ttl = None
+        if options['ttl_days'] is not None:
+            ttl = timedelta(days=options['ttl_days'])
+
+        if options['dry_run']:
+            summary = carts.report(ttl)
+            self.stdout.write(
+                f"Would delete {summary['carts']} carts with {summary['items']} items, "
+                f"oldest activity {summary['oldest_activity']}"
+            )
+            return
+
+        job = ExpireStaleCartsJob(ttl)
+        job.batch_size = options['batch_size']
+        run = job.run()
+        if run is None:
+            self.stdout.write(self.style.WARNING('A purge is already running'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Deleted {run.processed} carts in {run.batches} batches'))
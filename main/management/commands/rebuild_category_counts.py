@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from main.categories import refresh_posts_count
+
+
+class Command(BaseCommand):
+    help = 'Recounts the posts of every category'
+
+    def handle(self, *args, **options):
+        updated = refresh_posts_count()
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} categories'))
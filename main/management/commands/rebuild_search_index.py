@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from main.models import Post
+from main import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the post search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        post_ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(post_ids), batch_size):
+            search.index_posts(post_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {len(post_ids)} posts'))
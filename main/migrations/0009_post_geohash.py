@@ -0,0 +1,72 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# A frozen copy of main.geo's encoder as it was when this migration was
+# written, so it keeps storing the same cells whatever main.geo becomes.
+GEOHASH_PRECISION = 9
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            value, value_range = longitude, lon_range
+        else:
+            value, value_range = latitude, lat_range
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits = bits << 1
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def populate_geohash(apps, schema_editor):
+    Post = apps.get_model('main', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=BATCH_SIZE):
+        post.geohash = encode_geohash(post.latitude, post.longitude)
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    Post.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_alter_review_reviewer_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=9),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
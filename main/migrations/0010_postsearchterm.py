@@ -0,0 +1,86 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+from collections import defaultdict
+
+BATCH_SIZE = 1000
+
+# A frozen copy of main.search's tokenizer and weights as they were when this
+# migration was written, so it keeps building the same index whatever
+# main.search becomes. Changes to the tokenizer are followed by
+# manage.py rebuild_search_index, which goes through main.search.
+TITLE_WEIGHT = 3
+INGREDIENT_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    words = _WORD_RE.findall(text.lower())
+    return [word[:MAX_TERM_LENGTH] for word in words if len(word) >= MIN_TERM_LENGTH]
+
+
+def build_terms(PostSearchTerm, post, ingredient_names):
+    weights = defaultdict(int)
+    for term in tokenize(post.title):
+        weights[term] += TITLE_WEIGHT
+    for term in tokenize(post.description):
+        weights[term] += DESCRIPTION_WEIGHT
+    for name in ingredient_names:
+        for term in tokenize(name):
+            weights[term] += INGREDIENT_WEIGHT
+    return [PostSearchTerm(post_id=post.id, term=term, weight=weight) for term, weight in weights.items()]
+
+
+def index_batch(Ingredient, PostSearchTerm, posts):
+    ingredient_names = defaultdict(list)
+    for post_id, name in Ingredient.objects.filter(post_id__in=[post.id for post in posts]).values_list('post_id', 'name'):
+        ingredient_names[post_id].append(name)
+    terms = []
+    for post in posts:
+        terms += build_terms(PostSearchTerm, post, ingredient_names[post.id])
+    PostSearchTerm.objects.bulk_create(terms, batch_size=BATCH_SIZE)
+
+
+def populate_search_terms(apps, schema_editor):
+    Post = apps.get_model('main', 'Post')
+    Ingredient = apps.get_model('main', 'Ingredient')
+    PostSearchTerm = apps.get_model('main', 'PostSearchTerm')
+
+    batch = []
+    for post in Post.objects.only('id', 'title', 'description').iterator(chunk_size=BATCH_SIZE):
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            index_batch(Ingredient, PostSearchTerm, batch)
+            batch = []
+    index_batch(Ingredient, PostSearchTerm, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_post_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='main.post')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(populate_search_terms, migrations.RunPython.noop),
+    ]
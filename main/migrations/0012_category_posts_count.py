@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:07
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_posts_count(apps, schema_editor):
+    Category = apps.get_model('main', 'Category')
+    for category in Category.objects.annotate(count=Count('posts')):
+        Category.objects.filter(pk=category.pk).update(posts_count=category.count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_posts_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+import main.models
+import main.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_category_posts_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postimage',
+            name='staged_image',
+            field=models.FileField(blank=True, editable=False, storage=main.models.staging_storage, upload_to='posts/images'),
+        ),
+        migrations.AddField(
+            model_name='postimage',
+            name='status',
+            field=models.CharField(choices=[('P', 'Pending'), ('R', 'Ready'), ('F', 'Failed')], default='R', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='staged_image',
+            field=models.FileField(blank=True, editable=False, storage=main.models.staging_storage, upload_to='profiles/images'),
+        ),
+        migrations.AlterField(
+            model_name='postimage',
+            name='image',
+            field=models.ImageField(blank=True, upload_to='posts/images', validators=[main.validators.validate_file_size]),
+        ),
+        migrations.CreateModel(
+            name='PostImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('image', models.ImageField(upload_to='posts/images/variants')),
+                ('post_image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='main.postimage')),
+            ],
+            options={
+                'unique_together': {('post_image', 'name')},
+            },
+        ),
+    ]
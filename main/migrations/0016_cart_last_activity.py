@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:15
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def populate_last_activity(apps, schema_editor):
+    Cart = apps.get_model('main', 'Cart')
+    Cart.objects.update(last_activity=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='last_activity',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(populate_last_activity, migrations.RunPython.noop),
+    ]
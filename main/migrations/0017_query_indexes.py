@@ -0,0 +1,50 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_cart_last_activity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='sold_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user_profile', '-placed_at'], name='main_order_user_pr_c25384_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-placed_at'], name='main_order_placed__8769ad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('sold_out', False)), fields=['title'], name='post_available_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('sold_out', False)), fields=['price'], name='post_available_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('sold_out', False)), fields=['ready_date_time'], name='post_available_ready_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('sold_out', False)), fields=['last_update'], name='post_available_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['post', 'title'], name='main_review_post_id_feba89_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['reviewer_user', 'title'], name='main_review_reviewe_6b4df8_idx'),
+        ),
+    ]
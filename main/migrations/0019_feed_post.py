@@ -0,0 +1,22 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_post_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_entry', serialize=False, to='main.post')),
+                ('document', models.TextField()),
+                ('last_update', models.DateTimeField()),
+            ],
+        ),
+    ]
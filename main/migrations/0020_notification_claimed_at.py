@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_feed_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='status',
+            field=models.CharField(choices=[('P', 'Pending'), ('G', 'Sending'), ('S', 'Sent'), ('F', 'Failed')], default='P', max_length=1),
+        ),
+    ]
@@ -1,14 +1,72 @@
 from django.conf import settings
 from django.contrib import admin
-from django.core.validators import MinValueValidator
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.core.files.storage import FileSystemStorage, get_storage_class
 from django.db import models
+from django.utils import timezone
 from uuid import uuid4
+import os
 from .validators import validate_file_size
+from . import geo
 
 # Create your models here.
 
 
-class UserProfile(models.Model):
+class StagingStorage(FileSystemStorage):
+    # A local directory, for when the web and worker processes share a disk
+
+    @property
+    def base_location(self):
+        return settings.IMAGE_STAGING_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def staging_storage():
+    # Uploads wait here until a worker has processed them, so it has to be
+    # storage the web and worker processes share, see IMAGE_STAGING_STORAGE
+    return get_storage_class(settings.IMAGE_STAGING_STORAGE)()
+
+
+class RatingAggregates(models.Model):
+    # Maintained from Review changes by main.ratings
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(default=0, db_index=True)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    AGGREGATE_FIELDS = [
+        'review_count', 'rating_sum', 'rating_average',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count'
+    ]
+
+    @property
+    def rating_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}_count') for rating in range(1, 6)}
+
+    def save(self, *args, **kwargs):
+        # Saving every field would write back whatever aggregates this
+        # instance loaded, undoing reviews added since. Only main.ratings
+        # moves them; pass update_fields to set them by hand.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+
+class UserProfile(RatingAggregates):
     # first_name = models.CharField(max_length=255)
     # last_name = models.CharField(max_length=255, null=True, blank=True)
     # username = models.CharField(max_length=255, unique=True)
@@ -20,6 +78,7 @@ class UserProfile(models.Model):
     is_seller = models.BooleanField(default=False)
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     image = models.ImageField(upload_to='profiles/images', validators=[validate_file_size], null=True)
+    staged_image = models.FileField(upload_to='profiles/images', storage=staging_storage, blank=True, editable=False)
     # address
 
     def __str__(self) -> str:
@@ -64,7 +123,7 @@ class Address(models.Model):
 
 
 
-class Post(models.Model):
+class Post(RatingAggregates):
     title = models.CharField(max_length=255)
     description = models.TextField()
     delivery = models.BooleanField()
@@ -75,7 +134,11 @@ class Post(models.Model):
     location = models.CharField(max_length=255)
     latitude = models.DecimalField(max_digits=20, decimal_places=17)
     longitude = models.DecimalField(max_digits=20, decimal_places=17)
+    geohash = models.CharField(max_length=geo.GEOHASH_PRECISION, db_index=True, editable=False)
     last_update = models.DateTimeField(auto_now=True)
+    # Set by checkout and the mark_sold_out_posts job once servings run out or
+    # the ready time has passed, and cleared again once neither holds
+    sold_out = models.BooleanField(default=False)
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
     # categories
     # ingredients
@@ -85,24 +148,127 @@ class Post(models.Model):
     def __str__(self) -> str:
         return self.title
 
+    @staticmethod
+    def unavailable():
+        # Posts that ought to be sold out
+        return models.Q(servings_available__lte=0) | models.Q(ready_date_time__lt=timezone.now())
+
+    def save(self, *args, **kwargs):
+        self.geohash = geo.encode_geohash(self.latitude, self.longitude)
+        # Restocked or rescheduled posts are back on sale right away
+        if self.sold_out and self.servings_available > 0 and self.ready_date_time >= timezone.now():
+            self.sold_out = False
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ({'latitude', 'longitude'} & set(update_fields)):
+            kwargs['update_fields'] = update_fields = {*update_fields, 'geohash'}
+        if update_fields is not None and ({'servings_available', 'ready_date_time'} & set(update_fields)):
+            kwargs['update_fields'] = {*update_fields, 'sold_out'}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['title']
+        # Partial indexes over what the feed lists, one per filter and ordering
+        # it uses. MySQL can't build them and falls back to the FK indexes.
+        indexes = [
+            models.Index(fields=['title'], condition=models.Q(sold_out=False), name='post_available_title_idx'),
+            models.Index(fields=['price'], condition=models.Q(sold_out=False), name='post_available_price_idx'),
+            models.Index(fields=['ready_date_time'], condition=models.Q(sold_out=False), name='post_available_ready_idx'),
+            models.Index(fields=['last_update'], condition=models.Q(sold_out=False), name='post_available_updated_idx'),
+            # Every post, sold out or not, in the order main.sync reads changes
+            models.Index(fields=['last_update', 'id'], name='post_sync_idx')
+        ]
+
+
+
+class FeedPost(models.Model):
+    # A post as the feed lists it, kept by main.feed
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='feed_entry')
+    # JSON text rather than a JSONField, whose jsonb column on Postgres
+    # would not keep the keys in the serializer's order
+    document = models.TextField()
+    # The post's last_update when the document was built
+    last_update = models.DateTimeField()
+
+
+
+class PostTombstone(models.Model):
+    # Left by each deleted post for clients syncing through main.sync, and
+    # pruned after SYNC_TOMBSTONE_TTL
+    post_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'post_id'])
+        ]
+
+
+
+class PostSearchTerm(models.Model):
+    # Inverted index over post titles, descriptions and ingredient names,
+    # maintained by main.search
+    MAX_TERM_LENGTH = 64
+
+    term = models.CharField(max_length=MAX_TERM_LENGTH)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = [['term', 'post']]
 
 
 
 class PostImage(models.Model):
+
+    STATUS_PENDING = 'P'
+    STATUS_READY = 'R'
+    STATUS_FAILED = 'F'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed')
+    ]
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='posts/images', validators=[validate_file_size])
+    image = models.ImageField(upload_to='posts/images', validators=[validate_file_size], blank=True)
+    staged_image = models.FileField(upload_to='posts/images', storage=staging_storage, blank=True, editable=False)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=STATUS_READY)
+
+
+
+class PostImageVariant(models.Model):
+    # Resized WebP copies of a PostImage, generated by main.images
+    post_image = models.ForeignKey(PostImage, on_delete=models.CASCADE, related_name='variants')
+    name = models.CharField(max_length=32)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    image = models.ImageField(upload_to='posts/images/variants')
+
+    class Meta:
+        unique_together = [['post_image', 'name']]
 
 
 
 class Category(models.Model):
     title = models.CharField(max_length=255)
     posts = models.ManyToManyField(Post, related_name='categories', blank=True)
+    # Maintained by main.categories, rebuilt with rebuild_category_counts
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Like RatingAggregates.save: leave posts_count to main.categories
+        # rather than write back the count this instance loaded
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'posts_count'
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['title']
 
@@ -121,7 +287,7 @@ class Ingredient(models.Model):
 
 
 class Review(models.Model):
-    rating = models.PositiveSmallIntegerField()
+    rating = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     title = models.CharField(max_length=255, null=True, blank=True)
     text = models.TextField(null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True)
@@ -134,6 +300,11 @@ class Review(models.Model):
 
     class Meta:
         ordering = ['title']
+        # Reviews are listed per post or per reviewer, in title order
+        indexes = [
+            models.Index(fields=['post', 'title']),
+            models.Index(fields=['reviewer_user', 'title'])
+        ]
 
 
 
@@ -157,6 +328,53 @@ class Order(models.Model):
         permissions = [
             ('cancel_order', 'Can cancel order')
         ]
+        # Order history is listed newest first, per customer or for staff
+        indexes = [
+            models.Index(fields=['user_profile', '-placed_at']),
+            models.Index(fields=['-placed_at'])
+        ]
+
+
+
+class Notification(models.Model):
+    # Written in the same transaction as the event, delivered in batches by
+    # main.notifications
+
+    KIND_ORDER_PLACED = 'order_placed'
+    KIND_NEW_ORDER = 'new_order'
+
+    KIND_CHOICES = [
+        (KIND_ORDER_PLACED, 'Order placed'),
+        (KIND_NEW_ORDER, 'New order')
+    ]
+
+    STATUS_PENDING = 'P'
+    STATUS_SENDING = 'G'
+    STATUS_SENT = 'S'
+    STATUS_FAILED = 'F'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed')
+    ]
+
+    recipient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='notifications')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When a delivery last took the notification to send
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'status'])
+        ]
 
 
 
@@ -173,6 +391,8 @@ class Cart(models.Model):
     # id = models.UUIDField(primary_key=True, default=uuid4)
     id = models.UUIDField(default=uuid4, primary_key=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Moved forward by main.carts.touch whenever the cart's items change
+    last_activity = models.DateTimeField(default=timezone.now, db_index=True)
     # items
 
 
@@ -186,3 +406,32 @@ class CartItem(models.Model):
     class Meta:
         unique_together = [['cart', 'post']]
 
+
+
+
+class JobRun(models.Model):
+    # One row per run of a periodic job in main.jobs
+
+    STATUS_RUNNING = 'R'
+    STATUS_SUCCEEDED = 'S'
+    STATUS_FAILED = 'F'
+
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed')
+    ]
+
+    name = models.CharField(max_length=255)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    batches = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['name', '-started_at'])
+        ]
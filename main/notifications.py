@@ -0,0 +1,138 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Notification, Post
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+# Notifications for each recipient are collected this many seconds before
+# being delivered together
+COALESCE_SECONDS = getattr(settings, 'NOTIFICATIONS_COALESCE_SECONDS', 30)
+
+# A delivery that has not marked what it claimed as sent or failed by then
+# is taken to have died, and the notifications are sent again
+CLAIM_SECONDS = getattr(settings, 'NOTIFICATIONS_CLAIM_SECONDS', 300)
+
+
+class BaseBackend:
+    def send(self, recipient, notifications):
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    def send(self, recipient, notifications):
+        logger.info('Notify %s: %s', recipient, format_message(notifications))
+
+
+class LocMemBackend(BaseBackend):
+    # Keeps (recipient, message) pairs in memory, for tests
+    outbox = []
+
+    def send(self, recipient, notifications):
+        self.outbox.append((recipient, format_message(notifications)))
+
+
+def get_backend():
+    return import_string(getattr(settings, 'NOTIFICATIONS_BACKEND', 'main.notifications.ConsoleBackend'))()
+
+
+def format_message(notifications):
+    lines = []
+    for kind, label in Notification.KIND_CHOICES:
+        orders = [f'#{notification.order_id}' for notification in notifications if notification.kind == kind]
+        if orders:
+            lines.append(f"{label}: {', '.join(orders)}")
+    return '\n'.join(lines)
+
+
+def scheduled_key(recipient_id):
+    return f'notifications:scheduled:{recipient_id}'
+
+
+def notify_order_created(order):
+    """
+    Record the buyer and seller notifications for a new order. Must run
+    inside the checkout transaction; delivery is only scheduled once it
+    commits, so checkout never waits on it.
+    """
+    seller_ids = set(Post.objects.filter(orderitems__order=order).values_list('user_id', flat=True))
+    notifications = [
+        Notification(
+            recipient_id=order.user_profile_id,
+            order=order,
+            kind=Notification.KIND_ORDER_PLACED,
+            idempotency_key=f'order:{order.id}:buyer'
+        )
+    ] + [
+        Notification(
+            recipient_id=seller_id,
+            order=order,
+            kind=Notification.KIND_NEW_ORDER,
+            idempotency_key=f'order:{order.id}:seller:{seller_id}'
+        ) for seller_id in seller_ids
+    ]
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+
+    recipient_ids = {notification.recipient_id for notification in notifications}
+    transaction.on_commit(lambda: schedule_delivery(recipient_ids))
+
+
+def schedule_delivery(recipient_ids):
+    from .tasks import deliver_notifications
+
+    for recipient_id in recipient_ids:
+        # At most one delivery is queued per recipient and window; anything
+        # recorded in the meantime goes out with it
+        if cache.add(scheduled_key(recipient_id), True, COALESCE_SECONDS * 2):
+            deliver_notifications.apply_async((recipient_id,), countdown=COALESCE_SECONDS)
+
+
+def deliver(recipient_id):
+    """
+    Send all pending notifications of a recipient as one message. They are
+    claimed in a short transaction first, so the send holds no row locks
+    and a retry doesn't send them again while it runs. Claims older than
+    CLAIM_SECONDS, left by a worker that died mid-send, are taken again.
+    """
+    cache.delete(scheduled_key(recipient_id))
+
+    now = timezone.now()
+    claimable = Q(status=Notification.STATUS_PENDING) | Q(
+        status=Notification.STATUS_SENDING, claimed_at__lt=now - timedelta(seconds=CLAIM_SECONDS)
+    )
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .select_related('recipient__user')
+            .filter(claimable, recipient_id=recipient_id)
+            .order_by('pk')
+        )
+        if not notifications:
+            return 0
+        # Only what this delivery sends counts as an attempt, not rows
+        # another worker holds or that were recorded since
+        pks = [notification.pk for notification in notifications]
+        Notification.objects \
+            .filter(pk__in=pks) \
+            .update(status=Notification.STATUS_SENDING, claimed_at=now, attempts=F('attempts') + 1)
+
+    # Still this delivery's claim, unless another one took it over as stale
+    claimed = Notification.objects.filter(pk__in=pks, status=Notification.STATUS_SENDING, claimed_at=now)
+    try:
+        get_backend().send(notifications[0].recipient, notifications)
+    except Exception:
+        claimed.filter(attempts__gte=MAX_ATTEMPTS).update(status=Notification.STATUS_FAILED)
+        claimed.update(status=Notification.STATUS_PENDING)
+        raise
+    claimed.update(status=Notification.STATUS_SENT, sent_at=timezone.now())
+
+    return len(notifications)
@@ -1,4 +1,172 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, Cursor, CursorPagination, PageNumberPagination, _reverse_ordering
 
 class DefaultPagination(PageNumberPagination):
-    page_size = 10
\ No newline at end of file
+    page_size = 10
+
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that follows whatever ordering the view ended up with:
+    the ?ordering= param, then the queryset's own order_by, then the model's
+    Meta.ordering. The primary key is appended to break ties and the cursor
+    carries the value of every ordering column, so each page starts strictly
+    after the last row of the one before, however many rows share a price or
+    title and whatever is inserted in between. Pages never run COUNT(*) or
+    OFFSET over earlier pages.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-pk'
+
+    def get_ordering(self, request, queryset, view):
+        return self.with_tiebreaker(self.get_view_ordering(request, queryset, view))
+
+    def get_view_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return tuple(ordering)
+
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        if ordering:
+            return tuple(ordering)
+        return (self.ordering,)
+
+    @staticmethod
+    def with_tiebreaker(ordering):
+        """Cut the ordering at the primary key, appending it in the first column's direction if it's missing."""
+        for index, field in enumerate(ordering):
+            if field.lstrip('-') in ['pk', 'id']:
+                return tuple(ordering[:index + 1])
+        return (*ordering, '-pk' if ordering[0].startswith('-') else 'pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.pk_name = queryset.model._meta.pk.attname
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        self.position = self.cursor.position if self.cursor is not None else None
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if self.position is not None:
+            queryset = queryset.filter(self.after(self.position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def after(self, position, reverse):
+        """Rows past position in the order pages are read: a row comparison spelled out as Q objects."""
+        condition = Q(pk__in=[])
+        for index, field in enumerate(self.ordering):
+            ascending = field.startswith('-') == reverse
+            lookup = f"{self.names[index]}__{'gt' if ascending else 'lt'}"
+            ties = dict(zip(self.names[:index], position[:index]))
+            condition |= Q(**ties, **{lookup: position[index]})
+        return condition
+
+    @property
+    def names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self.get_position(self.page[-1]) if self.page else self.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.get_position(self.page[0]) if self.page else self.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_position(self, instance):
+        # Rows from .values() are dicts, keyed by column rather than by pk
+        if isinstance(instance, dict):
+            return [str(instance[self.pk_name if name == 'pk' else name]) for name in self.names]
+        return [str(getattr(instance, name)) for name in self.names]
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering) \
+                or not all(isinstance(value, str) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=position)
+
+    def encode_cursor(self, cursor):
+        if cursor.position is not None:
+            cursor = cursor._replace(position=json.dumps(cursor.position))
+        return super().encode_cursor(cursor)
+
+
+
+class FeedPagination(BasePagination):
+    """
+    Page numbers by default. Clients doing infinite scroll switch to keyset
+    pages by passing ?pagination=cursor, then follow the `next` links.
+    """
+    page_number_class = DefaultPagination
+    cursor_class = KeysetPagination
+    paginator = None
+
+    def use_cursor(self, request):
+        return (
+            self.cursor_class.cursor_query_param in request.query_params
+            or request.query_params.get('pagination') == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.paginator = self.cursor_class()
+        elif self.page_number_class is not None:
+            self.paginator = self.page_number_class()
+        else:
+            return None
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+
+
+class OrderPagination(FeedPagination):
+    # Order history stays a plain list unless a cursor page is asked for
+    page_number_class = None
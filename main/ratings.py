@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from .models import Post, UserProfile
+
+RATINGS = range(1, 6)
+
+
+def apply_deltas(queryset, deltas):
+    """
+    Adjust the rating aggregates of every row in the queryset with a single
+    UPDATE built from F() expressions, so concurrent reviews never overwrite
+    each other's counts.
+    """
+    count = F('review_count') + deltas['review_count']
+    total = F('rating_sum') + deltas['rating_sum']
+
+    # rating_average goes first: MySQL evaluates SET clauses left to right,
+    # and it has to see the counts from before this update like other backends
+    updates = {
+        'rating_average': Case(
+            When(review_count__lte=-deltas['review_count'], then=Value(0.0)),
+            default=Cast(total, FloatField()) / count,
+            output_field=FloatField()
+        )
+    }
+    for field, delta in deltas.items():
+        updates[field] = F(field) + delta
+    return queryset.update(**updates)
+
+
+def apply_review(post_id, rating, sign):
+    """Add (sign=1) or remove (sign=-1) one review from its post and seller."""
+    deltas = {'review_count': sign, 'rating_sum': sign * rating}
+    if rating in RATINGS:
+        deltas[f'rating_{rating}_count'] = sign
+
+    with transaction.atomic():
+        apply_deltas(Post.objects.filter(pk=post_id), deltas)
+        apply_deltas(UserProfile.objects.filter(post__id=post_id), deltas)
+
+
+def review_changed(before, after):
+    """
+    before and after are (post_id, rating) pairs, None when the review
+    was created or deleted.
+    """
+    if before == after:
+        return
+    with transaction.atomic():
+        if before is not None:
+            apply_review(*before, sign=-1)
+        if after is not None:
+            apply_review(*after, sign=1)
@@ -0,0 +1,86 @@
+"""
+JSON rendering with orjson. FastJSONRenderer produces the same bytes as
+DRF's JSONRenderer for compact output, and falls back to it for pretty
+printed output (?format=json with indent, the browsable API) or when
+orjson isn't installed. StreamingListMixin writes list responses out a
+chunk of objects at a time instead of rendering them in one piece.
+"""
+from itertools import islice
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Decimals, timedeltas, lazy strings and so on go through DRF's encoder;
+    # datetimes, dates, times and UUIDs are encoded by orjson itself
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if orjson is None or self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits and the like
+            return super().render(data, accepted_media_type, renderer_context)
+        # As JSONRenderer does, so the output stays a strict javascript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def stream_json_array(chunks, renderer, accepted_media_type=None, renderer_context=None):
+    """Yield the compact JSON of a list whose items come in chunks."""
+    yield b'['
+    separator = b''
+    for chunk in chunks:
+        if chunk:
+            # Rendered as a list, less the brackets
+            yield separator + renderer.render(chunk, accepted_media_type, renderer_context)[1:-1]
+            separator = b','
+    yield b']'
+
+
+class StreamingListMixin:
+    """
+    Streams an unpaginated list() as JSON, serializing and rendering
+    stream_chunk_size objects at a time, so the whole response is never held
+    in memory. Pretty printed and browsable API responses are rendered as
+    usual, and so are responses under ASGI, where Django 4.1 iterates
+    streaming content on the event loop and the queries can't run.
+    """
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        renderer_context = self.get_renderer_context()
+        if (
+            self.paginator is not None
+            or isinstance(request._request, ASGIRequest)
+            or not isinstance(renderer, JSONRenderer)
+            or renderer.get_indent(request.accepted_media_type, renderer_context) is not None
+        ):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = (self.get_serializer(objects, many=True).data for objects in self.chunk(queryset))
+        return StreamingHttpResponse(
+            stream_json_array(chunks, renderer, request.accepted_media_type, renderer_context),
+            content_type=renderer.media_type
+        )
+
+    def chunk(self, queryset):
+        objects = queryset.iterator(chunk_size=self.stream_chunk_size)
+        while chunk := list(islice(objects, self.stream_chunk_size)):
+            yield chunk
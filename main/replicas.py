@@ -0,0 +1,139 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.utils.connection import ConnectionDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'pin_primary'
+
+# The replica a view that opted in with ReplicaReadMixin reads from while it
+# handles a safe request. Chosen once per request, so its count, page and
+# prefetches all see the same point of the primary's history.
+_replica = ContextVar('replica', default=None)
+
+# alias -> (checked at, healthy)
+_health = {}
+
+
+def is_healthy(alias):
+    """Ping the replica at most every REPLICA_HEALTH_CHECK_SECONDS."""
+    checked_at, healthy = _health.get(alias, (None, False))
+    now = time.monotonic()
+    if checked_at is not None and now - checked_at < settings.REPLICA_HEALTH_CHECK_SECONDS:
+        return healthy
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        healthy = True
+    except (ConnectionDoesNotExist, DatabaseError):
+        logger.warning('Replica %s is unavailable, reading from the primary', alias, exc_info=True)
+        healthy = False
+    _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    healthy = [alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+def current_replica():
+    return _replica.get()
+
+
+def reading_from_replica():
+    return _replica.get() is not None
+
+
+@contextmanager
+def replica_reads(alias):
+    """Send reads to the given replica, or to the primary when it is None."""
+    token = _replica.set(alias)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def pin_key(user):
+    return f'replicas:pin:{user.pk}'
+
+
+def pin_to_primary(request, response):
+    """Send the client's reads to the primary until its write has replicated."""
+    response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_LAG_SECONDS, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        # API clients authenticate with tokens and may drop cookies
+        cache.set(pin_key(user), True, settings.REPLICA_LAG_SECONDS)
+
+
+def is_pinned(request):
+    if PIN_COOKIE in request.COOKIES:
+        return True
+    user = request.user
+    return user.is_authenticated and cache.get(pin_key(user)) is not None
+
+
+def use_replicas(request):
+    return bool(settings.DATABASE_REPLICAS) and request.method in SAFE_METHODS and not is_pinned(request)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the healthy replica chosen for the safe request a
+    ReplicaReadMixin view is handling, and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        # Rows read from a replica are still saved to the primary
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in settings.DATABASE_REPLICAS:
+            return 'default'
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Serves GET, HEAD and OPTIONS requests from the read replicas, unless the
+    client wrote something within the last REPLICA_LAG_SECONDS.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Decided after authentication so token users can be pinned too
+        if use_replicas(request):
+            _replica.set(choose_replica())
+
+
+class PrimaryPinningMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request, response)
+        return response
@@ -0,0 +1,84 @@
+import re
+from collections import defaultdict
+from functools import reduce
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from .models import Ingredient, Post, PostSearchTerm
+
+TITLE_WEIGHT = 3
+INGREDIENT_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+MIN_TERM_LENGTH = 2
+
+# Runs of letters and digits in any script, so accented words stay whole
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    words = _WORD_RE.findall(text.lower())
+    return [word[:PostSearchTerm.MAX_TERM_LENGTH] for word in words if len(word) >= MIN_TERM_LENGTH]
+
+
+def build_terms(post, ingredient_names):
+    weights = defaultdict(int)
+    for term in tokenize(post.title):
+        weights[term] += TITLE_WEIGHT
+    for term in tokenize(post.description):
+        weights[term] += DESCRIPTION_WEIGHT
+    for name in ingredient_names:
+        for term in tokenize(name):
+            weights[term] += INGREDIENT_WEIGHT
+    return [PostSearchTerm(post_id=post.id, term=term, weight=weight) for term, weight in weights.items()]
+
+
+def index_posts(post_ids):
+    """Rebuild the search terms of the given posts."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+
+    posts = Post.objects.filter(pk__in=post_ids).only('id', 'title', 'description')
+    ingredient_names = defaultdict(list)
+    for post_id, name in Ingredient.objects.filter(post_id__in=post_ids).values_list('post_id', 'name'):
+        ingredient_names[post_id].append(name)
+
+    terms = []
+    for post in posts:
+        terms += build_terms(post, ingredient_names[post.id])
+
+    with transaction.atomic():
+        PostSearchTerm.objects.filter(post_id__in=post_ids).delete()
+        PostSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+def search_posts(queryset, words, match_all=False):
+    """
+    Filter the queryset down to posts matching the search words and annotate
+    each post with a `search_rank`. Every word is matched as a term prefix,
+    so 'tac' finds 'tacos'. With match_all each word has to match, otherwise
+    any of them is enough.
+    """
+    terms = sorted({term for word in words for term in tokenize(word)})
+    if not terms:
+        # Words too short to be indexed can't be looked up, so they match
+        # nothing rather than everything
+        return queryset.none() if any(word.strip() for word in words) else queryset
+
+    term_filters = [Q(term__startswith=term) for term in terms]
+    matches = PostSearchTerm.objects.filter(reduce(lambda x, y: x | y, term_filters))
+
+    if match_all:
+        for term_filter in term_filters:
+            queryset = queryset.filter(pk__in=PostSearchTerm.objects.filter(term_filter).values('post_id'))
+    else:
+        queryset = queryset.filter(pk__in=matches.values('post_id'))
+
+    rank = matches \
+        .filter(post=OuterRef('pk')) \
+        .values('post') \
+        .annotate(rank=Sum('weight')) \
+        .values('rank')
+    return queryset.annotate(search_rank=Subquery(rank)).order_by('-search_rank', *Post._meta.ordering)
@@ -1,16 +1,58 @@
+from collections import Counter
 from decimal import Decimal
-from django.db import transaction
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from functools import reduce
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from .cache import post_cache
+from .validators import validate_file_size
+from . import categories, fast_serializers, geo, images, search, sync, tasks
 from .signals import order_created
 from .models import Cart, CartItem, Order, OrderItem, Post, PostImage, Review, UserProfile, Category, Ingredient
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class StagedImageMixin:
+    """
+    Moves an uploaded `image` into the staging storage instead of writing it
+    to the media storage during the request. A worker turns it into the
+    real image once the transaction commits.
+    """
+    image_task = None
+
+    def stage_image(self, validated_data):
+        self._staged_image = None
+        if validated_data.get('image'):
+            self._staged_image = validated_data.pop('image')
+            validated_data['staged_image'] = self._staged_image
+
+    def enqueue_image(self, instance):
+        if self._staged_image is not None:
+            transaction.on_commit(lambda: self.image_task.delay(instance.pk))
+
+    def create(self, validated_data):
+        self.stage_image(validated_data)
+        instance = super().create(validated_data)
+        self.enqueue_image(instance)
+        return instance
+
+    def update(self, instance, validated_data):
+        self.stage_image(validated_data)
+        instance = super().update(instance, validated_data)
+        self.enqueue_image(instance)
+        return instance
+
+
+
+class UserProfileSerializer(StagedImageMixin, serializers.ModelSerializer):
     #eventually I will take the user_id from the request body instead
     user_id = serializers.IntegerField(read_only=True)
+    image_task = tasks.process_profile_image
 
     class Meta:
         model = UserProfile
-        fields = ['id', 'user_id', 'first_name', 'last_name', 'username', 'bio', 'image', 'phone', 'birth_date', 'is_seller']
+        fields = ['id', 'user_id', 'first_name', 'last_name', 'username', 'bio', 'image', 'phone', 'birth_date', 'is_seller', 'review_count', 'rating_average', 'rating_histogram']
+        read_only_fields = ['review_count', 'rating_average']
 
     # def first_name(self):
     #     return self.user.first_name
@@ -27,14 +69,31 @@ class PostProfileSerializer(serializers.ModelSerializer):
 
 
 
-class PostImageSerializer(serializers.ModelSerializer):
+class PostImageSerializer(StagedImageMixin, serializers.ModelSerializer):
+    image = serializers.ImageField(validators=[validate_file_size])
+    variants = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    image_task = tasks.process_post_image
+
     class Meta:
         model = PostImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'status', 'variants', 'srcset']
+        read_only_fields = ['status']
+
+    def absolute_url(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_variants(self, post_image: PostImage):
+        return {variant.name: self.absolute_url(variant.image.url) for variant in post_image.variants.all()}
+
+    def get_srcset(self, post_image: PostImage):
+        return images.srcset(post_image, self.absolute_url)
 
     def create(self, validated_data):
-        post_id = self.context['post_id']
-        return PostImage.objects.create(post_id=post_id, **validated_data)
+        validated_data['post_id'] = self.context['post_id']
+        validated_data['status'] = PostImage.STATUS_PENDING
+        return super().create(validated_data)
 
 
 
@@ -56,12 +115,16 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = ['id', 'title', 'description', 'delivery', 'pick_up', 'price', 'ready_date_time', 'servings_available', 'location', 'latitude', 'longitude', 'last_update', 'ingredients', 'user', 'user_info', 'images', 'categories']
+        fields = ['id', 'title', 'description', 'delivery', 'pick_up', 'price', 'ready_date_time', 'servings_available', 'sold_out', 'location', 'latitude', 'longitude', 'distance', 'last_update', 'ingredients', 'user', 'user_info', 'images', 'categories', 'review_count', 'rating_average', 'rating_histogram']
+        read_only_fields = ['sold_out', 'review_count', 'rating_average']
     
     #price_with_tax = serializers.SerializerMethodField(method_name='calculate_tax')
 
     user_info = serializers.SerializerMethodField(method_name='get_post_profile_serializer')
 
+    # Miles from the searched point, only set for lat/lon/radius searches
+    distance = serializers.SerializerMethodField()
+
     # # user = serializers.StringRelatedField()
     # # user = UserProfileSerializer()
     # user = serializers.HyperlinkedRelatedField(
@@ -72,12 +135,125 @@ class PostSerializer(serializers.ModelSerializer):
     # def calculate_tax(self, post: Post):
     #     return post.price * Decimal(1.1)
 
+    def get_distance(self, post: Post):
+        distance = getattr(post, 'distance', None)
+        if distance is None:
+            return None
+        return round(distance, 2)
+
     def get_post_profile_serializer(self, post: Post):
         return { "username": post.user.user.username,
                  "image": str(post.user.image) }
 
 
 
+class BulkPostListSerializer(serializers.ListSerializer):
+    """
+    Creates many posts with their categories and ingredients in one
+    transaction, using one bulk insert per table. Invalid items are skipped
+    and reported in the results instead of failing the whole batch.
+    Backends that don't return ids from bulk inserts (MySQL) insert the
+    posts one at a time instead.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or (self.max_length is not None and len(data) > self.max_length):
+            return super().to_internal_value(data)
+
+        self.item_errors = []
+        items = []
+        for item in data:
+            try:
+                items.append(self.child.run_validation(item))
+                self.item_errors.append({})
+            except serializers.ValidationError as exc:
+                items.append(None)
+                self.item_errors.append(exc.detail)
+        return items
+
+    def save(self, **kwargs):
+        items = [item for item in self.validated_data if item is not None]
+        seller_id = self.context.get('seller_id')
+        if seller_id is not None:
+            for item in items:
+                item['user'] = seller_id
+            user_ids = {seller_id}
+        else:
+            user_ids = set(UserProfile.objects.filter(pk__in={item['user'] for item in items}).values_list('pk', flat=True))
+        category_ids = set(Category.objects.filter(
+            pk__in={category for item in items for category in item['categories']}
+        ).values_list('pk', flat=True))
+
+        results = []
+        valid_items = []
+        for item, errors in zip(self.validated_data, self.item_errors):
+            if item is None:
+                results.append({'errors': errors})
+                continue
+            errors = {}
+            if item['user'] not in user_ids:
+                errors['user'] = ['No user profile with the given id was found']
+            unknown = [category for category in item['categories'] if category not in category_ids]
+            if unknown:
+                errors['categories'] = [f'No category with the id {category} was found' for category in unknown]
+            results.append({'errors': errors} if errors else None)
+            if not errors:
+                valid_items.append(item)
+
+        with transaction.atomic():
+            posts = [
+                Post(
+                    user_id=item['user'],
+                    geohash=geo.encode_geohash(item['latitude'], item['longitude']),
+                    **{field: value for field, value in item.items() if field not in ['user', 'categories', 'ingredients']}
+                )
+                for item in valid_items
+            ]
+            if connections[router.db_for_write(Post)].features.can_return_rows_from_bulk_insert:
+                Post.objects.bulk_create(posts)
+            else:
+                for post in posts:
+                    post.save(force_insert=True)
+
+            PostCategory = Category.posts.through
+            PostCategory.objects.bulk_create([
+                PostCategory(post_id=post.id, category_id=category)
+                for post, item in zip(posts, valid_items) for category in set(item['categories'])
+            ])
+            Ingredient.objects.bulk_create([
+                Ingredient(post_id=post.id, name=name)
+                for post, item in zip(posts, valid_items) for name in item['ingredients']
+            ])
+
+            # bulk_create skips the signals that keep these up to date
+            post_ids = [post.id for post in posts]
+            search.index_posts(post_ids)
+            categories.refresh_posts_count({category for item in valid_items for category in item['categories']})
+            transaction.on_commit(post_cache.invalidate)
+
+        created = iter(post_ids)
+        return [result or {'id': next(created)} for result in results]
+
+
+
+class BulkPostSerializer(serializers.ModelSerializer):
+    # Only admins name the user; everyone else posts as themselves
+    user = serializers.IntegerField(required=False)
+    categories = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    ingredients = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list)
+
+    def validate(self, data):
+        if 'user' not in data and self.context.get('seller_id') is None:
+            raise serializers.ValidationError({'user': ['This field is required.']})
+        return data
+
+    class Meta:
+        model = Post
+        fields = ['title', 'description', 'delivery', 'pick_up', 'price', 'ready_date_time', 'servings_available', 'location', 'latitude', 'longitude', 'user', 'categories', 'ingredients']
+        list_serializer_class = BulkPostListSerializer
+
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -93,6 +269,12 @@ class SimplePostSerializer(serializers.ModelSerializer):
         model = Post
         fields =['id', 'title', 'price', 'pick_up', 'delivery', 'location','images']
 
+    def to_representation(self, instance):
+        # Nested once per cart or order item, so built without DRF's per-field work
+        if not hasattr(self, '_fast'):
+            self._fast = fast_serializers.FastSimplePostSerializer(self.context)
+        return self._fast.to_representation(instance)
+
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -143,32 +325,90 @@ class CartSerializer(serializers.ModelSerializer):
 
 
 
+def check_cart_exists(cart_id):
+    # Otherwise adding to a missing cart fails on its foreign key
+    if not Cart.objects.filter(pk=cart_id).exists():
+        raise NotFound('No cart with the given id was found')
+
+
+
+class AddCartItemListSerializer(serializers.ListSerializer):
+    """Adds many items to a cart with a constant number of queries."""
+
+    def save(self, **kwargs):
+        cart_id = self.context['cart_id']
+        quantities = Counter()
+        for item in self.validated_data:
+            quantities[item['post_id']] += item['quantity']
+
+        found = set(Post.objects.filter(pk__in=quantities).values_list('pk', flat=True))
+        errors = [
+            {'post_id': ['No post with the given id was found']} if item['post_id'] not in found else {}
+            for item in self.validated_data
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        check_cart_exists(cart_id)
+
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    cart_items = CartItem.objects \
+                        .select_for_update() \
+                        .filter(cart_id=cart_id, post_id__in=quantities)
+                    existing = {item.post_id: item for item in cart_items}
+                    for post_id, item in existing.items():
+                        item.quantity += quantities[post_id]
+                    CartItem.objects.bulk_update(existing.values(), ['quantity'])
+                    CartItem.objects.bulk_create([
+                        CartItem(cart_id=cart_id, post_id=post_id, quantity=quantity)
+                        for post_id, quantity in quantities.items() if post_id not in existing
+                    ])
+                break
+            except IntegrityError:
+                # A concurrent request created one of the new items first
+                if attempt:
+                    raise
+
+        self.instance = list(CartItem.objects.filter(cart_id=cart_id, post_id__in=quantities))
+        return self.instance
+
+
+
 class AddCartItemSerializer(serializers.ModelSerializer):
     post_id = serializers.IntegerField()
 
-    def validate_post_id(self, value):
-        if not Post.objects.filter(pk=value).exists():
-            raise serializers.ValidationError('No post with the given id was found')
-        return value
-
     def save(self, **kwargs):
         cart_id = self.context['cart_id']
         post_id = self.validated_data['post_id']
         quantity = self.validated_data['quantity']
 
+        # The increment happens in the database, so concurrent adds of the
+        # same post can't overwrite each other
+        cart_items = CartItem.objects.filter(cart_id=cart_id, post_id=post_id)
+        if cart_items.update(quantity=F('quantity') + quantity):
+            self.instance = cart_items.get()
+            return self.instance
+
+        if not Post.objects.filter(pk=post_id).exists():
+            raise serializers.ValidationError({'post_id': ['No post with the given id was found']})
+        check_cart_exists(cart_id)
         try:
-            cart_item = CartItem.objects.get(cart_id=cart_id, post_id=post_id)
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(cart_id=cart_id, **self.validated_data)
+            with transaction.atomic():
+                self.instance = CartItem.objects.create(cart_id=cart_id, **self.validated_data)
+        except IntegrityError:
+            # Lost the race to create the item, so add to the one that won.
+            # With no item to add to, the cart went away in the meantime.
+            if not cart_items.update(quantity=F('quantity') + quantity):
+                raise
+            self.instance = cart_items.get()
 
         return self.instance
 
     class Meta:
         model = CartItem
         fields = ['id', 'post_id', 'quantity']
+        list_serializer_class = AddCartItemListSerializer
 
 
 
@@ -204,33 +444,89 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
 
 
 
+class PostChangesQuerySerializer(serializers.Serializer):
+    since = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=sync.MAX_PAGE_SIZE, default=sync.PAGE_SIZE)
+
+    def validate_since(self, value):
+        try:
+            return sync.Watermark.decode(value)
+        except ValueError:
+            raise serializers.ValidationError('Not a valid watermark.')
+
+
 class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
 
-    def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
-            raise serializers.ValidationError('No cart with the given ID was found')
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
-            raise serializers.ValidationError('The cart is empty.')
-        return cart_id
-
     def save(self, **kwargs):
         with transaction.atomic():
             cart_id = self.validated_data['cart_id']
 
-            user_profile = UserProfile.objects.get(user_id=self.context['user_id'])
-            order = Order.objects.create(user_profile=user_profile)
+            quantities = dict(CartItem.objects.filter(cart_id=cart_id).values_list('post_id', 'quantity'))
+            if not quantities:
+                if not Cart.objects.filter(pk=cart_id).exists():
+                    raise serializers.ValidationError({'cart_id': ['No cart with the given ID was found']})
+                raise serializers.ValidationError({'cart_id': ['The cart is empty.']})
+
+            # Lock the posts in primary key order so checkouts sharing posts
+            # queue up behind each other instead of deadlocking. Posts that
+            # are sold out or whose ready time has passed can't be ordered.
+            now = timezone.now()
+            available = Post.objects.filter(sold_out=False, ready_date_time__gte=now)
+            posts = list(
+                available
+                .select_for_update()
+                .filter(pk__in=quantities)
+                .order_by('pk')
+                .values('pk', 'price', 'servings_available')
+            )
+
+            found = {post['pk'] for post in posts}
+            errors = [
+                {'post_id': post_id, 'error': 'No longer available'}
+                for post_id in sorted(quantities) if post_id not in found
+            ]
+            errors += [
+                {
+                    'post_id': post['pk'],
+                    'error': f"Only {post['servings_available']} servings available"
+                }
+                for post in posts if post['servings_available'] < quantities[post['pk']]
+            ]
+            if errors:
+                raise serializers.ValidationError({'items': errors})
+
+            # Only rows that are still available with enough servings match, so
+            # a row that changed under a backend without row locks makes the count short
+            has_servings = reduce(lambda x, y: x | y, [
+                Q(pk=post_id, servings_available__gte=quantity) for post_id, quantity in quantities.items()
+            ])
+            updated = available.filter(has_servings).update(
+                # Off the feed as soon as the last serving is ordered. Ahead of
+                # servings_available, as MySQL applies SET clauses in order.
+                sold_out=Case(
+                    *[When(pk=post_id, servings_available__lte=quantity, then=Value(True)) for post_id, quantity in quantities.items()],
+                    default=Value(False)
+                ),
+                servings_available=Case(
+                    *[When(pk=post_id, then=F('servings_available') - quantity) for post_id, quantity in quantities.items()]
+                ),
+                last_update=now
+            )
+            if updated != len(quantities):
+                raise serializers.ValidationError({'items': ['Servings changed during checkout, please try again.']})
+            transaction.on_commit(post_cache.invalidate)
+
+            user_profile_id = UserProfile.objects.values_list('pk', flat=True).get(user_id=self.context['user_id'])
+            order = Order.objects.create(user_profile_id=user_profile_id)
 
-            cart_items = CartItem.objects \
-                                .select_related('post') \
-                                .filter(cart_id=cart_id)
             order_items = [
                 OrderItem(
                     order=order,
-                    post=item.post,
-                    unit_price = item.post.price,
-                    quantity=item.quantity
-                ) for item in cart_items
+                    post_id=post['pk'],
+                    unit_price = post['price'],
+                    quantity=quantities[post['pk']]
+                ) for post in posts
             ]
             OrderItem.objects.bulk_create(order_items)
 
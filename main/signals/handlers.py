@@ -1,9 +1,182 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
-from main.models import UserProfile
+from main.models import UserProfile, Post, PostImage, PostTombstone, Category, Ingredient, Review
+from main.cache import category_cache, post_cache
+from main import categories, feed, ratings, search, sync
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, **kwargs):
     if kwargs['created']:
-        UserProfile.objects.create(user=kwargs['instance']) 
\ No newline at end of file
+        UserProfile.objects.create(user=kwargs['instance'])
+
+
+def deleted_with_post(origin):
+    # origin is the instance or queryset that started the delete
+    model = origin.model if hasattr(origin, 'model') else type(origin)
+    return model is Post
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_posts([instance.id])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def index_ingredient_post(sender, instance, **kwargs):
+    if deleted_with_post(kwargs.get('origin')):
+        return
+    search.index_posts([instance.post_id])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(m2m_changed, sender=Category.posts.through)
+def invalidate_post_cache(sender, **kwargs):
+    invalidate_posts()
+
+
+def invalidate_posts():
+    post_cache.invalidate()
+    # Again once the change is visible, in case a request cached the old
+    # rows while the transaction was still open
+    transaction.on_commit(post_cache.invalidate)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._rated_before = None
+    if instance.pk is not None:
+        instance._rated_before = Review.objects.filter(pk=instance.pk).values_list('post_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def update_ratings_for_saved_review(sender, instance, **kwargs):
+    ratings.review_changed(getattr(instance, '_rated_before', None), (instance.post_id, instance.rating))
+
+
+@receiver(post_delete, sender=Review)
+def update_ratings_for_deleted_review(sender, instance, **kwargs):
+    ratings.review_changed((instance.post_id, instance.rating), None)
+
+
+@receiver(m2m_changed, sender=Category.posts.through)
+def update_category_posts_count(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse is True when the change came through post.categories
+    if action == 'pre_clear':
+        if reverse:
+            instance._cleared_category_ids = list(instance.categories.values_list('id', flat=True))
+        return
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+
+    if not reverse:
+        category_ids = [instance.pk]
+    elif action == 'post_clear':
+        category_ids = instance._cleared_category_ids
+    else:
+        category_ids = pk_set
+    if category_ids:
+        categories.refresh_posts_count(category_ids)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_categories(sender, instance, **kwargs):
+    instance._category_ids = list(instance.categories.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def update_deleted_post_categories(sender, instance, **kwargs):
+    if instance._category_ids:
+        categories.refresh_posts_count(instance._category_ids)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+    category_cache.invalidate()
+    transaction.on_commit(category_cache.invalidate)
+
+
+# Keep last_update moving whenever a post's serialized form changes, for
+# clients syncing through main.sync and for the feed documents in main.feed.
+# Seller renames and category deletes only reach the posts through here.
+
+def posts_changed(posts):
+    sync.touch_posts(posts)
+    feed.refresh_on_commit(posts)
+    invalidate_posts()
+
+
+@receiver(post_save, sender=Post)
+def refresh_feed_post(sender, instance, **kwargs):
+    feed.refresh_on_commit(Post.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def touch_parent_post(sender, instance, **kwargs):
+    if deleted_with_post(kwargs.get('origin')):
+        return
+    post_ids = {instance.post_id}
+    # A review moved to another post changes the one it left too
+    rated_before = getattr(instance, '_rated_before', None)
+    if rated_before is not None:
+        post_ids.add(rated_before[0])
+    posts_changed(Post.objects.filter(pk__in=post_ids))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def touch_seller_posts(sender, instance, created, update_fields, **kwargs):
+    # Logins save last_login alone
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    posts_changed(Post.objects.filter(user__user=instance))
+
+
+@receiver(post_save, sender=UserProfile)
+def touch_profile_posts(sender, instance, created, **kwargs):
+    if not created:
+        posts_changed(instance.post_set.all())
+
+
+@receiver(m2m_changed, sender=Category.posts.through)
+def touch_recategorized_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if not reverse:
+            instance._cleared_post_ids = list(instance.posts.values_list('id', flat=True))
+        return
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+
+    if reverse:
+        post_ids = [instance.pk]
+    elif action == 'post_clear':
+        post_ids = instance._cleared_post_ids
+    else:
+        post_ids = pk_set
+    posts_changed(Post.objects.filter(pk__in=post_ids))
+
+
+@receiver(pre_delete, sender=Category)
+def touch_uncategorized_posts(sender, instance, **kwargs):
+    # The category's rows in the through table go without an m2m_changed
+    posts_changed(instance.posts.all())
+
+
+@receiver(post_delete, sender=Post)
+def record_post_tombstone(sender, instance, **kwargs):
+    PostTombstone.objects.create(post_id=instance.pk)
@@ -0,0 +1,10 @@
+# Imported only where configured: cloudinary_storage needs credentials to load
+from cloudinary_storage.storage import MediaCloudinaryStorage
+
+
+class StagingCloudinaryStorage(MediaCloudinaryStorage):
+    # The media storage under a staging/ prefix, for image uploads waiting on
+    # a worker when the web and worker processes run on separate machines
+
+    def _get_prefix(self):
+        return self._normalize_path(super()._get_prefix()) + 'staging/'
@@ -0,0 +1,104 @@
+"""
+Delta sync for clients that keep their own copy of the posts. A watermark
+marks how far through the (last_update, id) order a client has read; each
+request returns the posts after it, the ids of posts deleted since, and the
+watermark to send next time. Posts whose children change are touched by the
+signal handlers, so their last_update moves too.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from . import replicas
+from .models import PostTombstone
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class SyncExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'This watermark is older than the deletion log; sync again from the start.'
+    default_code = 'sync_expired'
+
+
+class Watermark(NamedTuple):
+    # Position in the (last_update, id) order
+    last_update: datetime
+    post_id: int
+    # When the response carrying it was made
+    issued_at: datetime
+
+    def encode(self):
+        value = f'{self.last_update.isoformat()},{self.post_id},{self.issued_at.isoformat()}'
+        return urlsafe_b64encode(value.encode()).decode()
+
+    @classmethod
+    def decode(cls, token):
+        """Raises ValueError for anything encode() didn't make."""
+        last_update, post_id, issued_at = urlsafe_b64decode(token.encode()).decode().split(',')
+        watermark = cls(datetime.fromisoformat(last_update), int(post_id), datetime.fromisoformat(issued_at))
+        if timezone.is_naive(watermark.last_update) or timezone.is_naive(watermark.issued_at):
+            raise ValueError('Watermarks carry aware datetimes')
+        return watermark
+
+
+def touch_posts(queryset):
+    """Move last_update forward on posts whose reviews, images, ingredients or categories changed."""
+    queryset.update(last_update=timezone.now())
+
+
+def cutoff():
+    """
+    Changes are only handed out once they are this old. last_update is set
+    before its transaction commits, so a newer row could still be joined by
+    older ones that commit late, or be missing from a lagging replica.
+    """
+    settle = settings.SYNC_SETTLE_SECONDS
+    if replicas.reading_from_replica():
+        settle += settings.REPLICA_LAG_SECONDS
+    return timezone.now() - timedelta(seconds=settle)
+
+
+def changes(queryset, since, page_size):
+    """
+    Return the rows of queryset, .values() of posts, changed after the since
+    watermark, oldest first and at most page_size of them; the ids of posts
+    deleted in the same span; the next watermark; and whether there are more
+    changes to fetch right away. Without a watermark every post is returned
+    and no deletions.
+    """
+    now = timezone.now()
+    if since is not None and since.issued_at < now - settings.SYNC_TOMBSTONE_TTL:
+        raise SyncExpired()
+    until = cutoff()
+
+    posts = queryset.filter(last_update__lt=until)
+    if since is not None:
+        posts = posts.filter(
+            Q(last_update__gt=since.last_update) | Q(last_update=since.last_update, pk__gt=since.post_id)
+        )
+    posts = list(posts.order_by('last_update', 'pk')[:page_size + 1])
+    has_more = len(posts) > page_size
+    posts = posts[:page_size]
+
+    if has_more:
+        watermark = Watermark(posts[-1]['last_update'], posts[-1]['id'], now)
+    else:
+        # Rows at exactly the cutoff were left out, so they come next time
+        watermark = Watermark(until, 0, now)
+
+    deleted = []
+    if since is not None:
+        # Each deletion falls in exactly one [since, next) span of a client's requests
+        deleted = list(
+            PostTombstone.objects
+            .filter(deleted_at__gte=since.last_update, deleted_at__lt=watermark.last_update)
+            .order_by('deleted_at', 'pk')
+            .values_list('post_id', flat=True)
+        )
+    return posts, deleted, watermark, has_more
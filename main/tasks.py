@@ -0,0 +1,23 @@
+from celery import shared_task
+from . import images, jobs, notifications
+
+
+@shared_task(autoretry_for=(ConnectionError,), retry_backoff=True, max_retries=5)
+def process_post_image(post_image_id):
+    images.process_post_image(post_image_id)
+
+
+@shared_task(autoretry_for=(ConnectionError,), retry_backoff=True, max_retries=5)
+def process_profile_image(user_profile_id):
+    images.process_profile_image(user_profile_id)
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, retry_backoff_max=600, max_retries=notifications.MAX_ATTEMPTS - 1)
+def deliver_notifications(recipient_id):
+    return notifications.deliver(recipient_id)
+
+
+@shared_task
+def run_job(name):
+    run = jobs.run_job(name)
+    return run.processed if run is not None else None
@@ -1,6 +1,15 @@
 from rest_framework.test import APIClient
 import pytest
+from django.conf import settings
+from django.core.cache import caches
 from django.contrib.auth.models import User
+from model_bakery import baker
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
 
 @pytest.fixture
 def api_client():
@@ -10,4 +19,9 @@ def api_client():
 def authenticate(api_client):
     def do_authenticate(is_staff=False):
         return api_client.force_authenticate(user=User(is_staff=is_staff))
-    return do_authenticate
\ No newline at end of file
+    return do_authenticate
+
+@pytest.fixture
+def user_profile():
+    # UserProfile rows are created by the post_save handler for new users
+    return baker.make(settings.AUTH_USER_MODEL).userprofile
@@ -0,0 +1,80 @@
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import AsyncRequestFactory
+from main import async_views
+from main.models import Cart, CartItem, Category, Ingredient, Post, PostImage
+from model_bakery import baker
+import pytest
+
+
+@pytest.fixture
+def async_get():
+    def do_async_get(view_class, url, **kwargs):
+        request = AsyncRequestFactory().get(url)
+        return async_to_sync(view_class.as_view())(request, **kwargs)
+    return do_async_get
+
+
+@pytest.fixture
+def sync_get(api_client):
+    def do_sync_get(url):
+        # Nothing cached by the async request may answer this one
+        for cache in caches.all():
+            cache.clear()
+        return api_client.get(url)
+    return do_sync_get
+
+
+@pytest.fixture
+def posts(user_profile):
+    category = baker.make(Category)
+    posts = baker.make(Post, user=user_profile, price=5, _quantity=12)
+    for post in posts:
+        baker.make(PostImage, post=post, image='posts/images/pizza.jpg')
+        baker.make(Ingredient, post=post)
+        category.posts.add(post)
+    return posts
+
+
+@pytest.mark.django_db
+class TestAsyncViews:
+    @pytest.mark.parametrize('params', ['', '?page=2', '?ordering=-price&maxprice=10', '?search=a'])
+    def test_feed_matches_the_viewset(self, posts, async_get, sync_get, params):
+        response = async_get(async_views.PostListView, f'/main/posts/{params}')
+
+        assert response.status_code == 200
+        assert response.content == sync_get(f'/main/posts/{params}').content
+
+    def test_post_detail_matches_the_viewset(self, posts, async_get, sync_get):
+        response = async_get(async_views.PostDetailView, f'/main/posts/{posts[0].id}/', pk=posts[0].id)
+
+        assert response.content == sync_get(f'/main/posts/{posts[0].id}/').content
+
+    def test_missing_post_returns_404(self, async_get):
+        response = async_get(async_views.PostDetailView, '/main/posts/0/', pk=0)
+
+        assert response.status_code == 404
+
+    def test_categories_match_the_viewset(self, posts, async_get, sync_get):
+        response = async_get(async_views.CategoryListView, '/main/categories/')
+
+        assert response.content == sync_get('/main/categories/').content
+
+    def test_etag_matches_the_viewset(self, posts, api_client):
+        etag = api_client.get('/main/posts/')['ETag']
+        # Django 4.1's AsyncRequestFactory takes extra headers by their HTTP names
+        request = AsyncRequestFactory().get('/main/posts/', **{'If-None-Match': etag})
+
+        response = async_to_sync(async_views.PostListView.as_view())(request)
+
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+
+    def test_cart_matches_the_viewset(self, posts, async_get, sync_get):
+        cart = baker.make(Cart)
+        for post in posts[:3]:
+            baker.make(CartItem, cart=cart, post=post, quantity=2)
+
+        response = async_get(async_views.CartDetailView, f'/main/carts/{cart.id}/', pk=cart.id)
+
+        assert response.content == sync_get(f'/main/carts/{cart.id}/').content
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from io import StringIO
+from uuid import uuid4
+from django.core.management import call_command
+from django.utils import timezone
+from main.models import Cart, CartItem, Post
+from rest_framework import status
+from model_bakery import baker
+import pytest
+
+
+@pytest.fixture
+def cart():
+    return baker.make(Cart)
+
+
+@pytest.mark.django_db
+class TestAddCartItem:
+    def test_adding_the_same_post_twice_increments_quantity(self, user_profile, cart, api_client):
+        post = baker.make(Post, user=user_profile)
+
+        api_client.post(f'/main/carts/{cart.id}/items/', {'post_id': post.id, 'quantity': 2})
+        response = api_client.post(f'/main/carts/{cart.id}/items/', {'post_id': post.id, 'quantity': 3})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['quantity'] == 5
+        assert CartItem.objects.get(cart=cart, post=post).quantity == 5
+
+    def test_incrementing_an_existing_item_takes_three_queries(self, user_profile, cart, api_client, django_assert_num_queries):
+        post = baker.make(Post, user=user_profile)
+        baker.make(CartItem, cart=cart, post=post, quantity=1)
+
+        # Increment, read back the item, touch the cart
+        with django_assert_num_queries(3):
+            api_client.post(f'/main/carts/{cart.id}/items/', {'post_id': post.id, 'quantity': 1})
+
+    def test_unknown_post_returns_400(self, cart, api_client):
+        response = api_client.post(f'/main/carts/{cart.id}/items/', {'post_id': 0, 'quantity': 1})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['post_id'] is not None
+
+    def test_unknown_cart_returns_404(self, user_profile, api_client):
+        post = baker.make(Post, user=user_profile)
+
+        response = api_client.post(f'/main/carts/{uuid4()}/items/', {'post_id': post.id, 'quantity': 1})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestBatchAddCartItems:
+    def test_merges_new_and_existing_items(self, user_profile, cart, api_client):
+        existing, new = baker.make(Post, user=user_profile, _quantity=2)
+        baker.make(CartItem, cart=cart, post=existing, quantity=1)
+
+        response = api_client.post(f'/main/carts/{cart.id}/items/batch/', [
+            {'post_id': existing.id, 'quantity': 2},
+            {'post_id': new.id, 'quantity': 1},
+            {'post_id': new.id, 'quantity': 4},
+        ], format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert {item['post_id']: item['quantity'] for item in response.data} == {existing.id: 3, new.id: 5}
+
+    def test_reports_errors_per_item(self, user_profile, cart, api_client):
+        post = baker.make(Post, user=user_profile)
+
+        response = api_client.post(f'/main/carts/{cart.id}/items/batch/', [
+            {'post_id': post.id, 'quantity': 1},
+            {'post_id': 0, 'quantity': 1},
+        ], format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data[0] == {}
+        assert response.data[1]['post_id'] is not None
+        assert not CartItem.objects.exists()
+
+    def test_unknown_cart_returns_404(self, user_profile, api_client):
+        post = baker.make(Post, user=user_profile)
+
+        response = api_client.post(f'/main/carts/{uuid4()}/items/batch/', [{'post_id': post.id, 'quantity': 1}], format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+
+@pytest.mark.django_db
+class TestCartExpiry:
+    def test_changing_an_item_moves_last_activity_forward(self, user_profile, cart, api_client):
+        long_ago = timezone.now() - timedelta(days=3)
+        Cart.objects.filter(pk=cart.pk).update(last_activity=long_ago)
+        item = baker.make(CartItem, cart=cart, post=baker.make(Post, user=user_profile), quantity=1)
+
+        api_client.patch(f'/main/carts/{cart.id}/items/{item.id}/', {'quantity': 2})
+
+        cart.refresh_from_db()
+        assert cart.last_activity > long_ago
+
+    def test_purge_dry_run_reports_without_deleting(self, settings, user_profile):
+        settings.CART_TTL = timedelta(days=1)
+        stale = baker.make(Cart)
+        Cart.objects.filter(pk=stale.pk).update(last_activity=timezone.now() - timedelta(days=2))
+        for post in baker.make(Post, user=user_profile, _quantity=2):
+            baker.make(CartItem, cart=stale, post=post)
+        baker.make(Cart)
+        out = StringIO()
+
+        call_command('purge_carts', '--dry-run', stdout=out)
+
+        assert 'Would delete 1 carts with 2 items' in out.getvalue()
+        assert Cart.objects.count() == 2
+
+        call_command('purge_carts', stdout=out)
+
+        assert not Cart.objects.filter(pk=stale.pk).exists()
+        assert Cart.objects.count() == 1
@@ -1,5 +1,5 @@
 from nis import cat
-from main.models import Category
+from main.models import Category, Post
 from django.contrib.auth.models import User
 from rest_framework import status
 import pytest
@@ -50,4 +50,33 @@ class TestRetrieveCategory:
             'id': category.id,
             'title': category.title,
             'posts_count': 0
-        }
\ No newline at end of file
+        }
+
+@pytest.mark.django_db
+class TestCategoryPostsCount:
+    def test_count_follows_both_sides_of_the_relation(self, user_profile, api_client):
+        category = baker.make(Category)
+        first, second, third = baker.make(Post, user=user_profile, _quantity=3)
+
+        category.posts.add(first, second)
+        third.categories.add(category)
+        first.categories.clear()
+        category.posts.remove(second)
+        third.delete()
+        second.categories.add(category)
+
+        category.refresh_from_db()
+        assert category.posts_count == 1
+        response = api_client.get(f'/main/categories/{category.id}/')
+        assert response.data['posts_count'] == 1
+
+    def test_saving_a_stale_instance_keeps_the_count(self, user_profile):
+        category = baker.make(Category)
+        stale = Category.objects.get(pk=category.pk)
+
+        category.posts.add(baker.make(Post, user=user_profile))
+        stale.title = 'Mexican'
+        stale.save()
+
+        category.refresh_from_db()
+        assert (category.title, category.posts_count) == ('Mexican', 1)
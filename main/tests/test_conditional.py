@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from main.models import Cart, CartItem, Category, Post
+from model_bakery import baker
+from rest_framework import status
+import pytest
+
+
+@pytest.fixture
+def post(user_profile):
+    return baker.make(Post, user=user_profile, title='Tacos')
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    @pytest.mark.parametrize('url', ['/main/posts/', '/main/posts/?ordering=price', '/main/categories/'])
+    def test_matching_etag_returns_304_without_queries(self, post, api_client, url):
+        etag = api_client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response['ETag'] == etag
+        assert response.content == b''
+        assert len(queries) == 0
+
+    def test_post_detail_etag_changes_when_the_post_does(self, post, api_client):
+        etag = api_client.get(f'/main/posts/{post.id}/')['ETag']
+
+        post.title = 'Burritos'
+        post.save()
+        response = api_client.get(f'/main/posts/{post.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['title'] == 'Burritos'
+        assert response['ETag'] != etag
+
+    def test_feed_pages_have_different_etags(self, post, api_client):
+        assert api_client.get('/main/posts/')['ETag'] != api_client.get('/main/posts/?ordering=price')['ETag']
+
+    def test_category_etag_changes_when_a_category_is_added(self, api_client):
+        etag = api_client.get('/main/categories/')['ETag']
+
+        baker.make(Category)
+
+        assert api_client.get('/main/categories/', HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+    def test_weak_etags_match(self, post, api_client):
+        etag = api_client.get('/main/posts/')['ETag']
+
+        response = api_client.get('/main/posts/', HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+class TestConditionalCart:
+    def test_etag_changes_with_the_items(self, post, api_client):
+        cart = baker.make(Cart)
+        item = baker.make(CartItem, cart=cart, post=post, quantity=1)
+        etag = api_client.get(f'/main/carts/{cart.id}/')['ETag']
+
+        assert api_client.get(f'/main/carts/{cart.id}/', HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+        item.quantity = 2
+        item.save()
+        response = api_client.get(f'/main/carts/{cart.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['items'][0]['quantity'] == 2
+
+    def test_deleted_cart_returns_404(self, api_client):
+        cart = baker.make(Cart)
+        etag = api_client.get(f'/main/carts/{cart.id}/')['ETag']
+
+        cart.delete()
+        response = api_client.get(f'/main/carts/{cart.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
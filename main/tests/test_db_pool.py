@@ -0,0 +1,70 @@
+from main.db.pool import ConnectionPool, PoolTimeout
+import pytest
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.usable = True
+
+
+@pytest.fixture
+def make_pool():
+    def do_make_pool(**kwargs):
+        def reset(connection):
+            if connection.closed:
+                raise ValueError('closed')
+
+        def close(connection):
+            connection.closed = True
+
+        return ConnectionPool(
+            connect=FakeConnection,
+            is_usable=lambda connection: connection.usable,
+            reset=reset,
+            close=close,
+            **kwargs
+        )
+    return do_make_pool
+
+
+class TestConnectionPool:
+    def test_reuses_returned_connections(self, make_pool):
+        pool = make_pool()
+        connection = pool.checkout()
+        pool.checkin(connection)
+
+        assert pool.checkout() is connection
+        assert pool.stats()['size'] == 1
+
+    def test_times_out_when_every_connection_is_in_use(self, make_pool):
+        pool = make_pool(max_size=1, timeout=0.01)
+        pool.checkout()
+
+        with pytest.raises(PoolTimeout):
+            pool.checkout()
+        assert pool.stats()['timeouts'] == 1
+
+    def test_drops_connections_that_cannot_be_reset(self, make_pool):
+        pool = make_pool(max_size=1)
+        connection = pool.checkout()
+        connection.closed = True
+        pool.checkin(connection)
+
+        assert pool.checkout() is not connection
+        assert pool.stats()['in_use'] == 1
+
+    def test_replaces_idle_connections_that_fail_the_health_check(self, make_pool):
+        pool = make_pool(max_size=1, health_check_seconds=0)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        connection.usable = False
+
+        replacement = pool.checkout()
+
+        assert replacement is not connection
+        assert connection.closed
+        assert pool.stats() | {'wait_avg_ms': 0, 'wait_max_ms': 0} == {
+            'size': 1, 'in_use': 1, 'idle': 0, 'max_size': 1, 'checkouts': 2, 'timeouts': 0,
+            'wait_avg_ms': 0, 'wait_max_ms': 0
+        }
@@ -0,0 +1,88 @@
+from decimal import Decimal
+from django.test import RequestFactory
+from main import geo, search
+from main.feed import FeedSerializer
+from main.fast_serializers import FastPostSerializer
+from main.models import Cart, CartItem, Category, Ingredient, Post, PostImage, PostImageVariant
+from main.serializers import CartSerializer, PostSerializer
+from model_bakery import baker
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+import pytest
+
+
+@pytest.fixture
+def context():
+    return {'request': RequestFactory().get('/main/posts/')}
+
+
+@pytest.fixture
+def posts(user_profile):
+    user_profile.image = 'userprofile/images/me.webp'
+    user_profile.save()
+    categories = baker.make(Category, _quantity=3)
+    posts = []
+    for index in range(4):
+        post = baker.make(
+            Post, user=user_profile, title=f'Tacos {index}',
+            latitude=Decimal('34.465037'), longitude=Decimal('-110.091227') + index
+        )
+        post_image = baker.make(PostImage, post=post, image=f'posts/images/tacos_{index}.jpg')
+        for name, width in [('thumb', 200), ('full', 1600), ('card', 400)]:
+            baker.make(PostImageVariant, post_image=post_image, name=name, width=width, height=width, image=f'posts/images/tacos_{index}_{name}.webp')
+        baker.make(PostImage, post=post, image='')
+        baker.make(Ingredient, post=post, _quantity=2)
+        for category in categories[index % 2:]:
+            category.posts.add(post)
+        posts.append(post)
+    return posts
+
+
+def feed_queryset():
+    return Post.objects.select_related('user__user').prefetch_related('images__variants', 'ingredients', 'categories')
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+class TestFastPostSerializer:
+    @pytest.mark.parametrize('narrow', [
+        lambda queryset: queryset,
+        lambda queryset: geo.within_radius(queryset, 34.465037, -110.091227, 100),
+        lambda queryset: search.search_posts(queryset, ['tacos']),
+    ])
+    def test_output_is_identical_to_post_serializer(self, posts, context, narrow):
+        queryset = narrow(feed_queryset())
+
+        expected = PostSerializer(queryset, many=True, context=context).data
+        actual = FastPostSerializer(context).serialize(FastPostSerializer.values(queryset))
+
+        assert render(actual) == render(expected)
+
+    @pytest.mark.parametrize('narrow', [
+        lambda queryset: queryset,
+        lambda queryset: geo.within_radius(queryset, 34.465037, -110.091227, 100),
+    ])
+    def test_feed_documents_are_identical_to_post_serializer(self, posts, context, narrow):
+        queryset = narrow(feed_queryset())
+
+        expected = PostSerializer(queryset, many=True, context=context).data
+        # Built on the first read, then read back
+        FeedSerializer(context).serialize(FeedSerializer.values(queryset))
+        actual = FeedSerializer(context).serialize(FeedSerializer.values(queryset))
+
+        assert render(actual) == render(expected)
+
+    def test_simple_post_output_is_identical(self, posts, context):
+        cart = baker.make(Cart)
+        for post in posts:
+            baker.make(CartItem, cart=cart, post=post, quantity=1)
+        cart = Cart.objects.prefetch_related('items__post__images__variants').get(pk=cart.pk)
+
+        serializer = CartSerializer(cart, context=context)
+        simple_post = serializer.fields['items'].child.fields['post']
+        expected = [serializers.ModelSerializer.to_representation(simple_post, item.post) for item in cart.items.all()]
+
+        assert render([item['post'] for item in serializer.data['items']]) == render(expected)
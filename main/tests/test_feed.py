@@ -0,0 +1,102 @@
+from io import StringIO
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from main import feed, replicas
+from main.models import FeedPost, Ingredient, Post, PostImage, Review
+from model_bakery import baker
+import pytest
+
+
+@pytest.fixture
+def post(user_profile):
+    post = baker.make(Post, user=user_profile, title='Tacos')
+    baker.make(PostImage, post=post, image='posts/images/tacos.jpg')
+    return post
+
+
+def get_feed(api_client):
+    # Past the response cache, to the read model
+    for cache in caches.all():
+        cache.clear()
+    return api_client.get('/main/posts/')
+
+
+@pytest.mark.django_db
+class TestFeedReadModel:
+    def test_page_is_read_in_one_query_once_documents_are_built(self, post, api_client):
+        get_feed(api_client)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = get_feed(api_client)
+
+        assert [item['title'] for item in response.data['results']] == ['Tacos']
+        # The page and its count
+        assert len(queries) == 2
+
+    def test_changed_post_is_rebuilt(self, post, api_client):
+        get_feed(api_client)
+
+        post.title = 'Burritos'
+        post.save()
+        baker.make(Ingredient, post=post, name='Beans')
+        response = get_feed(api_client)
+
+        [item] = response.data['results']
+        assert item['title'] == 'Burritos'
+        assert [ingredient['name'] for ingredient in item['ingredients']] == ['Beans']
+        assert 'Burritos' in FeedPost.objects.get(pk=post.pk).document
+
+    def test_documents_are_refreshed_when_changes_commit(self, post, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            post.title = 'Burritos'
+            post.save()
+
+        entry = FeedPost.objects.get(pk=post.pk)
+        assert entry.last_update == Post.objects.get(pk=post.pk).last_update
+        assert 'Burritos' in entry.document
+
+    def test_moved_review_rebuilds_the_post_it_left(self, post, user_profile, api_client):
+        other = baker.make(Post, user=user_profile, title='Burritos')
+        review = baker.make(Review, post=post, rating=5, reviewer_user=user_profile)
+        get_feed(api_client)
+
+        review.post = other
+        review.save()
+        response = get_feed(api_client)
+
+        assert {item['title']: item['review_count'] for item in response.data['results']} == {'Burritos': 1, 'Tacos': 0}
+
+    def test_stale_documents_read_from_a_replica_are_not_stored(self, post):
+        FeedPost.objects.all().delete()
+
+        # A replica in step with the primary
+        with replicas.replica_reads('default'):
+            [item] = feed.FeedSerializer().serialize(feed.FeedSerializer.values(Post.objects.all()))
+
+        assert item['title'] == 'Tacos'
+        assert not FeedPost.objects.exists()
+
+    @pytest.mark.parametrize('with_target', [True, False])
+    def test_upsert_names_a_conflict_target_only_where_supported(self, post, monkeypatch, with_target):
+        # MySQL has no conflict target, and Django refuses unique_fields there
+        monkeypatch.setattr(connection.features, 'supports_update_conflicts_with_target', with_target)
+        calls = []
+        monkeypatch.setattr(FeedPost.objects, 'bulk_create', lambda entries, **kwargs: calls.append(kwargs))
+
+        feed.refresh([post.pk])
+
+        assert [call.get('unique_fields') for call in calls] == [['post'] if with_target else None]
+        assert calls[0]['update_conflicts'] is True
+
+
+@pytest.mark.django_db
+def test_rebuild_feed_builds_every_document(user_profile):
+    posts = baker.make(Post, user=user_profile, _quantity=3)
+    out = StringIO()
+
+    call_command('rebuild_feed', '--batch-size', '2', stdout=out)
+
+    assert sorted(FeedPost.objects.values_list('pk', flat=True)) == sorted(post.id for post in posts)
+    assert 'Rebuilt the feed documents of 3 posts' in out.getvalue()
@@ -0,0 +1,115 @@
+from io import BytesIO, StringIO
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from main import images, tasks
+from main.models import Post, PostImage
+from rest_framework import status
+from model_bakery import baker
+from PIL import Image
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def local_storage(settings, tmp_path):
+    settings.DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.IMAGE_STAGING_ROOT = str(tmp_path / 'staging')
+
+
+@pytest.fixture
+def upload():
+    buffer = BytesIO()
+    Image.new('RGB', (2000, 1000), 'orange').save(buffer, 'JPEG')
+    return SimpleUploadedFile('pizza.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@pytest.mark.django_db
+class TestPostImageUpload:
+    def test_upload_is_staged_and_processed_later(self, user_profile, upload, api_client, monkeypatch, django_capture_on_commit_callbacks):
+        post = baker.make(Post, user=user_profile)
+        queued = []
+        monkeypatch.setattr(tasks.process_post_image, 'delay', queued.append)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(f'/main/posts/{post.id}/images/', {'image': upload}, format='multipart')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['status'] == PostImage.STATUS_PENDING
+        assert response.data['image'] is None
+        assert queued == [response.data['id']]
+
+        images.process_post_image(response.data['id'])
+
+        post_image = PostImage.objects.get(pk=response.data['id'])
+        assert post_image.status == PostImage.STATUS_READY
+        assert not post_image.staged_image
+        assert post_image.image.name.startswith('posts/images/pizza')
+        sizes = {variant.name: (variant.width, variant.height) for variant in post_image.variants.all()}
+        assert sizes == {'thumb': (200, 100), 'card': (400, 200), 'full': (1600, 800)}
+
+    def test_unreadable_upload_is_marked_failed(self, user_profile):
+        post_image = baker.make(PostImage, post=baker.make(Post, user=user_profile), status=PostImage.STATUS_PENDING)
+        post_image.staged_image.save('broken.jpg', SimpleUploadedFile('broken.jpg', b'not an image'))
+        staged = post_image.staged_image
+        touched_before = Post.objects.get(pk=post_image.post_id).last_update
+
+        images.process_post_image(post_image.id)
+
+        post_image.refresh_from_db()
+        assert post_image.status == PostImage.STATUS_FAILED
+        assert not post_image.staged_image
+        assert not staged.storage.exists(staged.name)
+        assert Post.objects.get(pk=post_image.post_id).last_update > touched_before
+
+    def test_unreachable_storage_is_retried(self, user_profile, upload, monkeypatch):
+        post_image = baker.make(PostImage, post=baker.make(Post, user=user_profile), status=PostImage.STATUS_PENDING)
+        post_image.staged_image.save('pizza.jpg', upload)
+        attempts = []
+
+        def unreachable(*args):
+            attempts.append(args)
+            raise ConnectionError('storage is down')
+        monkeypatch.setattr(images, 'generate_variants', unreachable)
+
+        result = tasks.process_post_image.apply(args=[post_image.id])
+
+        assert isinstance(result.result, ConnectionError)
+        assert len(attempts) == tasks.process_post_image.max_retries + 1
+        post_image.refresh_from_db()
+        assert post_image.status == PostImage.STATUS_PENDING
+        assert post_image.staged_image
+
+
+@pytest.mark.django_db
+class TestImageVariants:
+    def test_backfill_generates_variants_for_existing_images(self, user_profile, upload, api_client, django_capture_on_commit_callbacks):
+        post = baker.make(Post, user=user_profile)
+        post_image = baker.make(PostImage, post=post)
+        post_image.image.save('pizza.jpg', upload)
+        # Cached, along with the post's feed document, before the backfill
+        api_client.get(f'/main/posts/{post.id}/')
+        api_client.get('/main/posts/')
+        last_update = Post.objects.get(pk=post.pk).last_update
+
+        with django_capture_on_commit_callbacks(execute=True):
+            call_command('backfill_image_variants', stdout=StringIO())
+
+        assert sorted(post_image.variants.values_list('name', flat=True)) == ['card', 'full', 'thumb']
+        assert Post.objects.get(pk=post.pk).last_update > last_update
+        assert set(api_client.get('/main/posts/').data['results'][0]['images'][0]['variants']) == {'thumb', 'card', 'full'}
+        image = api_client.get(f'/main/posts/{post.id}/').data['images'][0]
+        assert set(image['variants']) == {'thumb', 'card', 'full'}
+        assert image['srcset'].startswith(image['variants']['thumb'] + ' 200w, ')
+
+    def test_srcset_lists_each_width_once(self, user_profile, api_client):
+        buffer = BytesIO()
+        Image.new('RGB', (150, 100), 'orange').save(buffer, 'JPEG')
+        post = baker.make(Post, user=user_profile)
+        post_image = baker.make(PostImage, post=post, status=PostImage.STATUS_PENDING)
+        post_image.staged_image.save('small.jpg', SimpleUploadedFile('small.jpg', buffer.getvalue()))
+
+        images.process_post_image(post_image.id)
+
+        image = api_client.get(f'/main/posts/{post.id}/').data['images'][0]
+        assert set(image['variants']) == {'thumb', 'card', 'full'}
+        assert image['srcset'] == image['variants']['thumb'] + ' 150w'
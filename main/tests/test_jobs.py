@@ -0,0 +1,84 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from main import jobs
+from main.models import Cart, CartItem, JobRun, Post
+from model_bakery import baker
+import pytest
+
+
+@pytest.mark.django_db
+class TestExpireStaleCartsJob:
+    def test_deletes_carts_older_than_the_ttl_in_batches(self, settings, user_profile, monkeypatch):
+        settings.CART_TTL = timedelta(days=1)
+        monkeypatch.setattr(jobs.ExpireStaleCartsJob, 'batch_size', 2)
+        stale = baker.make(Cart, _quantity=3)
+        Cart.objects.filter(pk__in=[cart.pk for cart in stale]).update(last_activity=timezone.now() - timedelta(days=2))
+        baker.make(CartItem, cart=stale[0], post=baker.make(Post, user=user_profile))
+        fresh = baker.make(Cart)
+
+        run = jobs.run_job('expire_stale_carts')
+
+        assert list(Cart.objects.all()) == [fresh]
+        assert not CartItem.objects.exists()
+        assert (run.status, run.processed, run.batches) == (JobRun.STATUS_SUCCEEDED, 3, 2)
+
+    def test_batches_are_checked_again_before_deleting(self, settings):
+        settings.CART_TTL = timedelta(days=1)
+        # As if it saw activity after its batch was read
+        cart = baker.make(Cart)
+
+        assert jobs.ExpireStaleCartsJob().process([cart.pk]) == 0
+        assert Cart.objects.filter(pk=cart.pk).exists()
+
+
+@pytest.mark.django_db
+class TestMarkSoldOutPostsJob:
+    def test_marks_posts_without_servings_or_past_their_ready_time(self, user_profile, api_client):
+        future = timezone.now() + timedelta(days=1)
+        no_servings = baker.make(Post, user=user_profile, servings_available=0, ready_date_time=future)
+        expired = baker.make(Post, user=user_profile, servings_available=5, ready_date_time=timezone.now() - timedelta(hours=1))
+        available = baker.make(Post, user=user_profile, servings_available=5, ready_date_time=future)
+        api_client.get('/main/posts/')
+
+        run = jobs.run_job('mark_sold_out_posts')
+
+        assert run.processed == 2
+        assert set(Post.objects.filter(sold_out=True)) == {no_servings, expired}
+        response = api_client.get('/main/posts/')
+        assert [post['id'] for post in response.data['results']] == [available.id]
+
+    def test_clears_posts_that_are_available_again(self, user_profile):
+        future = timezone.now() + timedelta(days=1)
+        restocked = baker.make(Post, user=user_profile, servings_available=5, ready_date_time=future)
+        still_out = baker.make(Post, user=user_profile, servings_available=0, ready_date_time=future)
+        Post.objects.update(sold_out=True)
+
+        run = jobs.run_job('mark_sold_out_posts')
+
+        assert run.processed == 1
+        assert set(Post.objects.filter(sold_out=True)) == {still_out}
+
+    def test_restocking_a_post_clears_it_at_once(self, user_profile):
+        post = baker.make(Post, user=user_profile, servings_available=0, ready_date_time=timezone.now() + timedelta(days=1))
+        Post.objects.filter(pk=post.pk).update(sold_out=True)
+        post.refresh_from_db()
+
+        post.servings_available = 5
+        post.save(update_fields=['servings_available'])
+
+        assert not Post.objects.get(pk=post.pk).sold_out
+
+    def test_batches_are_checked_again_before_updating(self, user_profile):
+        post = baker.make(Post, user=user_profile, servings_available=0, ready_date_time=timezone.now() + timedelta(days=1))
+        Post.objects.filter(pk=post.pk).update(servings_available=5)
+
+        assert jobs.MarkSoldOutPostsJob().process([post.pk]) == 0
+        assert not Post.objects.get(pk=post.pk).sold_out
+
+    def test_skips_the_run_while_another_one_holds_the_lock(self):
+        job = jobs.MarkSoldOutPostsJob()
+        cache.add(job.lock_key, 'other', 60)
+
+        assert job.run() is None
+        assert not JobRun.objects.exists()
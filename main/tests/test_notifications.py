@@ -0,0 +1,98 @@
+from datetime import timedelta
+from django.utils import timezone
+from main import notifications, tasks
+from main.models import Cart, CartItem, Notification, Post
+from model_bakery import baker
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def locmem_backend(settings):
+    settings.NOTIFICATIONS_BACKEND = 'main.notifications.LocMemBackend'
+    notifications.LocMemBackend.outbox = []
+
+
+@pytest.fixture
+def place_order(api_client, user_profile, monkeypatch, django_capture_on_commit_callbacks):
+    scheduled = []
+    monkeypatch.setattr(tasks.deliver_notifications, 'apply_async', lambda args, countdown: scheduled.append(args[0]))
+
+    def do_place_order(*sellers):
+        cart = baker.make(Cart)
+        for seller in sellers:
+            post = baker.make(Post, user=seller, servings_available=5, ready_date_time=timezone.now() + timedelta(days=1))
+            baker.make(CartItem, cart=cart, post=post, quantity=1)
+        api_client.force_authenticate(user=user_profile.user)
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post('/main/orders/', {'cart_id': str(cart.id)})
+        return scheduled
+    return do_place_order
+
+
+@pytest.mark.django_db
+class TestOrderNotifications:
+    def test_checkout_records_notifications_and_schedules_one_delivery_per_recipient(self, user_profile, place_order):
+        seller = baker.make('core.User').userprofile
+
+        place_order(seller)
+        scheduled = place_order(seller)
+
+        assert Notification.objects.filter(recipient=seller, kind=Notification.KIND_NEW_ORDER).count() == 2
+        assert Notification.objects.filter(recipient=user_profile, kind=Notification.KIND_ORDER_PLACED).count() == 2
+        assert sorted(scheduled) == sorted([user_profile.id, seller.id])
+
+    def test_delivery_sends_pending_notifications_as_one_message(self, place_order):
+        seller = baker.make('core.User').userprofile
+        place_order(seller)
+        place_order(seller)
+
+        assert notifications.deliver(seller.id) == 2
+        assert notifications.deliver(seller.id) == 0
+
+        (recipient, message), = notifications.LocMemBackend.outbox
+        assert recipient == seller
+        assert message.startswith('New order: #')
+        assert not Notification.objects.filter(recipient=seller, status=Notification.STATUS_PENDING).exists()
+
+    def test_failed_delivery_is_retried_then_marked_failed(self, place_order, monkeypatch):
+        seller = baker.make('core.User').userprofile
+        place_order(seller)
+
+        def fail(*args):
+            raise ConnectionError()
+        monkeypatch.setattr(notifications.LocMemBackend, 'send', fail)
+
+        for _ in range(notifications.MAX_ATTEMPTS):
+            with pytest.raises(ConnectionError):
+                notifications.deliver(seller.id)
+
+        notification = Notification.objects.get(recipient=seller)
+        assert (notification.status, notification.attempts) == (Notification.STATUS_FAILED, notifications.MAX_ATTEMPTS)
+
+    def test_notifications_are_claimed_before_sending(self, place_order, monkeypatch):
+        seller = baker.make('core.User').userprofile
+        place_order(seller)
+        statuses = []
+        monkeypatch.setattr(notifications.LocMemBackend, 'send', lambda backend, recipient, sent: statuses.extend(
+            Notification.objects.filter(recipient=seller).values_list('status', flat=True)
+        ))
+
+        notifications.deliver(seller.id)
+
+        assert statuses == [Notification.STATUS_SENDING]
+        assert Notification.objects.get(recipient=seller).status == Notification.STATUS_SENT
+
+    def test_stale_claims_are_sent_again(self, place_order):
+        seller = baker.make('core.User').userprofile
+        place_order(seller)
+        place_order(seller)
+        stale, recent = Notification.objects.filter(recipient=seller).order_by('pk')
+        now = timezone.now()
+        Notification.objects.filter(pk=stale.pk).update(
+            status=Notification.STATUS_SENDING, claimed_at=now - timedelta(seconds=notifications.CLAIM_SECONDS + 1)
+        )
+        Notification.objects.filter(pk=recent.pk).update(status=Notification.STATUS_SENDING, claimed_at=now)
+
+        assert notifications.deliver(seller.id) == 1
+        assert Notification.objects.get(pk=stale.pk).status == Notification.STATUS_SENT
+        assert Notification.objects.get(pk=recent.pk).status == Notification.STATUS_SENDING
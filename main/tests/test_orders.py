@@ -0,0 +1,89 @@
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main.models import Cart, CartItem, Order, Post
+from rest_framework import status
+from model_bakery import baker
+import pytest
+
+
+@pytest.fixture
+def checkout(api_client, user_profile):
+    def do_checkout(cart):
+        api_client.force_authenticate(user=user_profile.user)
+        return api_client.post('/main/orders/', {'cart_id': str(cart.id)})
+    return do_checkout
+
+
+@pytest.fixture
+def make_cart(user_profile):
+    def do_make_cart(*quantities, servings_available=10, **post_fields):
+        cart = baker.make(Cart)
+        for quantity in quantities:
+            post = baker.make(Post, user=user_profile, servings_available=servings_available, ready_date_time=timezone.now() + timedelta(days=1))
+            # As the job would leave them, without Post.save putting them back on sale
+            Post.objects.filter(pk=post.pk).update(**post_fields)
+            baker.make(CartItem, cart=cart, post=post, quantity=quantity)
+        return cart
+    return do_make_cart
+
+
+@pytest.mark.django_db
+class TestCheckout:
+    def test_creates_order_and_reserves_servings(self, make_cart, checkout):
+        cart = make_cart(2, 3)
+        posts = [item.post for item in cart.items.all()]
+
+        response = checkout(cart)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(item['quantity'] for item in response.data['items']) == [2, 3]
+        assert [Post.objects.get(pk=post.pk).servings_available for post in posts] == [8, 7]
+        assert not Cart.objects.filter(pk=cart.pk).exists()
+
+    def test_ordering_the_last_servings_marks_the_post_sold_out(self, make_cart, checkout):
+        cart = make_cart(4, 1, servings_available=4)
+
+        checkout(cart)
+
+        assert sorted(Post.objects.values_list('servings_available', 'sold_out')) == [(0, True), (3, False)]
+
+    def test_rejects_overselling_with_per_item_errors(self, make_cart, checkout):
+        cart = make_cart(1, 5, servings_available=4)
+
+        response = checkout(cart)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert len(response.data['items']) == 1
+        assert response.data['items'][0]['error'] == 'Only 4 servings available'
+        assert not Order.objects.exists()
+        assert set(Post.objects.values_list('servings_available', flat=True)) == {4}
+        assert Cart.objects.filter(pk=cart.pk).exists()
+
+    @pytest.mark.parametrize('post_fields', [{'sold_out': True}, {'ready_date_time': timezone.now() - timedelta(hours=1)}])
+    def test_rejects_posts_no_longer_available(self, make_cart, checkout, post_fields):
+        cart = make_cart(1, **post_fields)
+
+        response = checkout(cart)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['items'][0]['error'] == 'No longer available'
+        assert not Order.objects.exists()
+        assert Post.objects.get().servings_available == 10
+
+    def test_empty_cart_returns_400(self, make_cart, checkout):
+        response = checkout(make_cart())
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['cart_id'] is not None
+
+    def test_query_count_does_not_grow_with_cart_size(self, make_cart, checkout):
+        small, large = make_cart(1), make_cart(1, 1, 1, 1)
+
+        with CaptureQueriesContext(connection) as one_item:
+            checkout(small)
+        with CaptureQueriesContext(connection) as four_items:
+            checkout(large)
+
+        assert len(four_items.captured_queries) == len(one_item.captured_queries)
@@ -0,0 +1,279 @@
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection
+from main import geo
+from main.models import Category, Ingredient, Post
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def search_posts(api_client):
+    def do_search_posts(**params):
+        return api_client.get('/main/posts/', params)
+    return do_search_posts
+
+
+class TestGeohash:
+    def test_encode_matches_known_value(self):
+        assert geo.encode_geohash(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+
+    def test_covering_cells_contain_center(self):
+        cells = geo.covering_cells(34.465037, -110.091227, 10)
+        center = geo.encode_geohash(34.465037, -110.091227)
+        assert any(center.startswith(cell) for cell in cells)
+        assert len(cells) <= geo.MAX_SEARCH_CELLS
+
+
+@pytest.mark.django_db
+class TestRadiusSearch:
+    def test_geohash_is_kept_in_sync_on_save(self, user_profile):
+        post = baker.make(Post, user=user_profile, latitude=Decimal('34.465037'), longitude=Decimal('-110.091227'))
+        assert post.geohash == geo.encode_geohash(34.465037, -110.091227)
+
+        post.latitude = Decimal('40.0')
+        post.save(update_fields=['latitude'])
+        post.refresh_from_db()
+        assert post.geohash == geo.encode_geohash(40.0, -110.091227)
+
+    def test_returns_only_posts_inside_radius(self, user_profile, search_posts):
+        near = baker.make(Post, user=user_profile, latitude=Decimal('34.47'), longitude=Decimal('-110.09'))
+        # Inside the bounding box corner, but about 13 miles away.
+        baker.make(Post, user=user_profile, latitude=Decimal('34.60'), longitude=Decimal('-109.93'))
+        baker.make(Post, user=user_profile, latitude=Decimal('40.0'), longitude=Decimal('-100.0'))
+
+        response = search_posts(lat=34.465037, lon=-110.091227, radius=10)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [post['id'] for post in response.data['results']] == [near.id]
+
+    def test_orders_by_distance_and_returns_it(self, user_profile, search_posts):
+        far = baker.make(Post, user=user_profile, latitude=Decimal('34.55'), longitude=Decimal('-110.09'))
+        near = baker.make(Post, user=user_profile, latitude=Decimal('34.47'), longitude=Decimal('-110.09'))
+
+        response = search_posts(lat=34.465037, lon=-110.091227, radius=10, ordering='distance')
+
+        results = response.data['results']
+        assert [post['id'] for post in results] == [near.id, far.id]
+        assert results[0]['distance'] < results[1]['distance'] <= 10
+
+    def test_distance_ordering_is_ignored_without_radius(self, user_profile, search_posts):
+        baker.make(Post, user=user_profile, latitude=Decimal('34.47'), longitude=Decimal('-110.09'))
+
+        response = search_posts(ordering='distance')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'][0]['distance'] is None
+
+
+@pytest.mark.django_db
+class TestKeywordSearch:
+    def test_matches_title_description_and_ingredients_ranked(self, user_profile, search_posts):
+        in_description = baker.make(Post, user=user_profile, title='Soup', description='With spicy chorizo')
+        in_title = baker.make(Post, user=user_profile, title='Chorizo tacos', description='Fresh')
+        in_ingredients = baker.make(Post, user=user_profile, title='Burrito', description='Big')
+        baker.make(Ingredient, post=in_ingredients, name='Chorizo')
+        baker.make(Post, user=user_profile, title='Salad', description='Green')
+
+        response = search_posts(searchwords='choriz')
+
+        assert [post['id'] for post in response.data['results']] == [in_title.id, in_ingredients.id, in_description.id]
+
+    def test_search_param_requires_every_word(self, user_profile, search_posts):
+        tacos = baker.make(Post, user=user_profile, title='Chorizo tacos', description='Fresh')
+        baker.make(Post, user=user_profile, title='Chorizo burrito', description='Big')
+
+        response = search_posts(search='chorizo tacos')
+
+        assert [post['id'] for post in response.data['results']] == [tacos.id]
+
+    def test_accented_words_are_indexed_whole(self, user_profile, search_posts):
+        brulee = baker.make(Post, user=user_profile, title='Crème brûlée', description='Vanilla')
+        baker.make(Post, user=user_profile, title='Cream puff', description='Bread')
+
+        assert [post['id'] for post in search_posts(search='brûl').data['results']] == [brulee.id]
+        assert [post['title'] for post in search_posts(search='cream').data['results']] == ['Cream puff']
+
+    @pytest.mark.parametrize('params', [{'search': 'z'}, {'searchwords': 'z,-'}])
+    def test_words_too_short_to_index_match_nothing(self, user_profile, search_posts, params):
+        baker.make(Post, user=user_profile, title='Pizza', description='Big')
+
+        assert search_posts(**params).data['results'] == []
+
+    def test_index_follows_ingredient_deletes(self, user_profile, search_posts):
+        post = baker.make(Post, user=user_profile, title='Burrito', description='Big')
+        ingredient = baker.make(Ingredient, post=post, name='Chorizo')
+
+        ingredient.delete()
+
+        assert search_posts(searchwords='chorizo').data['results'] == []
+
+
+@pytest.mark.django_db
+class TestPostResponseCache:
+    def test_repeated_list_is_served_from_cache(self, user_profile, search_posts, django_assert_num_queries):
+        baker.make(Post, user=user_profile, title='Tacos')
+        first = search_posts(maxprice=50, page=1)
+
+        with django_assert_num_queries(0):
+            second = search_posts(page=1, maxprice=50)
+
+        assert second.data == first.data
+
+    def test_saving_a_post_invalidates_cached_responses(self, user_profile, search_posts):
+        post = baker.make(Post, user=user_profile, title='Tacos')
+        search_posts()
+
+        post.title = 'Burritos'
+        post.save()
+
+        assert search_posts().data['results'][0]['title'] == 'Burritos'
+
+    def test_renaming_the_seller_invalidates_cached_responses(self, user_profile, search_posts):
+        baker.make(Post, user=user_profile)
+        search_posts()
+
+        user_profile.user.username = 'renamed'
+        user_profile.user.save()
+
+        assert search_posts().data['results'][0]['user_info']['username'] == 'renamed'
+
+    def test_deleting_a_category_invalidates_cached_responses(self, user_profile, search_posts):
+        category = baker.make(Category)
+        baker.make(Post, user=user_profile, categories=[category])
+        search_posts()
+
+        category.delete()
+
+        assert search_posts().data['results'][0]['categories'] == []
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+    def test_walks_the_feed_without_gaps_or_counts(self, user_profile, api_client):
+        posts = [baker.make(Post, user=user_profile, price=Decimal(price)) for price in range(1, 8)]
+
+        response = api_client.get('/main/posts/', {'pagination': 'cursor', 'ordering': 'price', 'page_size': 3})
+        seen = [post['id'] for post in response.data['results']]
+        while response.data['next']:
+            response = api_client.get(response.data['next'])
+            seen += [post['id'] for post in response.data['results']]
+
+        assert 'count' not in response.data
+        assert seen == [post.id for post in posts]
+
+    def test_ties_are_broken_by_id_across_writes(self, user_profile, api_client):
+        posts = baker.make(Post, user=user_profile, price=Decimal('5.00'), _quantity=7)
+        ids = [post.id for post in posts]
+
+        response = api_client.get('/main/posts/', {'pagination': 'cursor', 'ordering': 'price', 'page_size': 3})
+        seen = [post['id'] for post in response.data['results']]
+        # An offset into the tie would now skip a post, and the insert would shift the rest
+        posts[0].delete()
+        inserted = baker.make(Post, user=user_profile, price=Decimal('5.00'))
+        while response.data['next']:
+            response = api_client.get(response.data['next'])
+            seen += [post['id'] for post in response.data['results']]
+
+        assert seen == ids + [inserted.id]
+
+    def test_previous_links_walk_back(self, user_profile, api_client):
+        baker.make(Post, user=user_profile, price=Decimal('5.00'), _quantity=5)
+
+        first = api_client.get('/main/posts/', {'pagination': 'cursor', 'ordering': 'price', 'page_size': 2})
+        second = api_client.get(first.data['next'])
+        back = api_client.get(second.data['previous'])
+
+        assert back.data['results'] == first.data['results']
+
+    def test_page_size_is_capped(self, user_profile, api_client):
+        baker.make(Post, user=user_profile, _quantity=3)
+
+        response = api_client.get('/main/posts/', {'pagination': 'cursor', 'page_size': 1000})
+
+        assert len(response.data['results']) == 3
+
+
+@pytest.fixture
+def post_data(user_profile):
+    def do_post_data(**kwargs):
+        return {
+            'title': 'Tacos', 'description': 'Al pastor', 'delivery': True, 'pick_up': False,
+            'price': '8.50', 'ready_date_time': '2022-12-01T18:00:00Z', 'servings_available': 4,
+            'location': 'Show Low', 'latitude': '34.465037', 'longitude': '-110.091227',
+            'user': user_profile.id, **kwargs
+        }
+    return do_post_data
+
+
+@pytest.fixture
+def seller_client(api_client, user_profile):
+    api_client.force_authenticate(user=user_profile.user)
+    return api_client
+
+
+@pytest.mark.django_db
+class TestBulkCreatePosts:
+    def test_creates_posts_with_categories_and_ingredients(self, post_data, seller_client, django_assert_max_num_queries):
+        category = baker.make(Category)
+        data = [post_data(title=f'Tacos {i}', categories=[category.id], ingredients=['Pork', 'Pineapple']) for i in range(20)]
+
+        with django_assert_max_num_queries(14):
+            response = seller_client.post('/main/posts/bulk/', data, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        post = Post.objects.get(pk=response.data[0]['id'])
+        assert post.geohash == geo.encode_geohash(34.465037, -110.091227)
+        assert sorted(post.ingredients.values_list('name', flat=True)) == ['Pineapple', 'Pork']
+        category.refresh_from_db()
+        assert category.posts_count == 20
+        assert seller_client.get('/main/posts/', {'searchwords': 'pineapple'}).data['count'] == 20
+
+    def test_inserts_one_at_a_time_without_returned_ids(self, post_data, seller_client, monkeypatch):
+        # As on MySQL
+        monkeypatch.setattr(type(connection.features), 'can_return_rows_from_bulk_insert', False)
+        category = baker.make(Category)
+
+        response = seller_client.post('/main/posts/bulk/', [post_data(categories=[category.id], ingredients=['Pork'])] * 2, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert sorted(item['id'] for item in response.data) == sorted(Post.objects.values_list('pk', flat=True))
+        assert Ingredient.objects.filter(post_id=response.data[1]['id']).exists()
+        category.refresh_from_db()
+        assert category.posts_count == 2
+
+    def test_reports_invalid_items_and_creates_the_rest(self, post_data, seller_client):
+        response = seller_client.post('/main/posts/bulk/', [
+            post_data(),
+            post_data(categories=[0]),
+            post_data(price='abc'),
+        ], format='json')
+
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        assert 'id' in response.data[0]
+        assert response.data[1]['errors']['categories'] is not None
+        assert response.data[2]['errors']['price'] is not None
+        assert Post.objects.count() == 1
+
+    def test_requires_authentication(self, post_data, api_client):
+        response = api_client.post('/main/posts/bulk/', [post_data()], format='json')
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_sellers_can_only_post_as_themselves(self, post_data, user_profile, seller_client):
+        other = baker.make(settings.AUTH_USER_MODEL).userprofile
+
+        response = seller_client.post('/main/posts/bulk/', [post_data(user=other.id)], format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Post.objects.get().user_id == user_profile.id
+
+    def test_admins_post_for_the_given_user(self, post_data, authenticate, api_client):
+        authenticate(is_staff=True)
+
+        response = api_client.post('/main/posts/bulk/', [post_data(), {**post_data(), 'user': None}], format='json')
+
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        assert 'id' in response.data[0]
+        assert response.data[1]['errors']['user'] is not None
@@ -0,0 +1,65 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from main.models import Cart, CartItem, Category, Ingredient, Post, PostImage, Review
+from model_bakery import baker
+import pytest
+
+# Each endpoint is requested once with one row and once with several. A
+# serializer field that queries per row makes the second count larger.
+
+
+@pytest.fixture
+def count_queries(api_client):
+    def do_count_queries(url):
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url)
+        assert response.status_code == 200
+        return len(context.captured_queries)
+    return do_count_queries
+
+
+@pytest.fixture
+def make_post(user_profile):
+    def do_make_post(**kwargs):
+        post = baker.make(Post, user=kwargs.pop('user', user_profile), **kwargs)
+        baker.make(PostImage, post=post, image='posts/images/pizza.jpg')
+        baker.make(Ingredient, post=post)
+        baker.make(Category).posts.add(post)
+        return post
+    return do_make_post
+
+
+@pytest.mark.django_db
+class TestQueryCounts:
+    def test_post_feed(self, make_post, count_queries):
+        make_post()
+        one = count_queries('/main/posts/')
+        for _ in range(4):
+            make_post(user=baker.make('core.User').userprofile)
+        assert count_queries('/main/posts/?page=1') == one
+
+    def test_user_profile_posts(self, user_profile, make_post, count_queries):
+        url = f'/main/userprofiles/{user_profile.id}/posts/'
+        make_post()
+        one = count_queries(url)
+        for _ in range(4):
+            make_post()
+        assert count_queries(url) == one
+
+    def test_reviews(self, make_post, count_queries):
+        post = make_post()
+        baker.make(Review, post=post, reviewer_user=baker.make('core.User').userprofile)
+        one = count_queries(f'/main/reviews/?post={post.id}')
+        for _ in range(4):
+            baker.make(Review, post=post, reviewer_user=baker.make('core.User').userprofile)
+        assert count_queries(f'/main/reviews/?post={post.id}') == one
+
+    def test_cart(self, make_post, count_queries):
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, post=make_post(), quantity=1)
+        one = count_queries(f'/main/carts/{cart.id}/')
+        one_item = count_queries(f'/main/carts/{cart.id}/items/')
+        for _ in range(4):
+            baker.make(CartItem, cart=cart, post=make_post(), quantity=1)
+        assert count_queries(f'/main/carts/{cart.id}/') == one
+        assert count_queries(f'/main/carts/{cart.id}/items/') == one_item
@@ -0,0 +1,93 @@
+import re
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main.models import Cart, CartItem, Order, Post, Review
+from main.sync import Watermark
+from model_bakery import baker
+import pytest
+
+# Every SELECT an endpoint runs is put through EXPLAIN QUERY PLAN. A plan line
+# that scans a whole table without an index means a query shape is missing
+# its index. The plan format is SQLite's, so other backends skip this.
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != 'sqlite', reason='Reads SQLite query plans')
+]
+
+TABLE_SCAN_RE = re.compile(r'\bSCAN (main_\w+)\b(?! USING)')
+
+
+@pytest.fixture
+def table_scans(api_client):
+    def do_table_scans(url):
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        assert response.status_code == 200
+
+        scans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                for row in cursor.fetchall():
+                    match = TABLE_SCAN_RE.search(row[-1])
+                    if match:
+                        scans.append((match.group(1), query['sql']))
+        return scans
+    return do_table_scans
+
+
+@pytest.fixture
+def post(user_profile):
+    return baker.make(Post, user=user_profile)
+
+
+@pytest.mark.parametrize('params', [
+    '',
+    '?minprice=1&maxprice=10',
+    '?deliveryoptions=both',
+    '?ordering=price',
+    '?ordering=-last_update',
+    '?ordering=ready_date_time',
+    '?pagination=cursor',
+])
+def test_post_feed(post, table_scans, params):
+    assert table_scans(f'/main/posts/{params}') == []
+
+
+def test_post_detail(post, table_scans):
+    assert table_scans(f'/main/posts/{post.id}/') == []
+
+
+@pytest.mark.parametrize('param', ['post', 'reviewer', 'profile'])
+def test_reviews(post, user_profile, table_scans, param):
+    baker.make(Review, post=post, reviewer_user=user_profile)
+    value = post.id if param == 'post' else user_profile.id
+
+    assert table_scans(f'/main/reviews/?{param}={value}') == []
+
+
+def test_order_history(post, user_profile, api_client, table_scans):
+    baker.make(Order, user_profile=user_profile, _quantity=2)
+    api_client.force_authenticate(user=user_profile.user)
+
+    assert table_scans('/main/orders/') == []
+
+
+def test_cart_items(post, table_scans):
+    cart = baker.make(Cart)
+    baker.make(CartItem, cart=cart, post=post, quantity=1)
+
+    assert table_scans(f'/main/carts/{cart.id}/items/') == []
+
+
+def test_post_changes(post, table_scans):
+    now = timezone.now()
+    since = Watermark(now, 0, now).encode()
+
+    assert table_scans(f'/main/posts/changes/?since={since}') == []
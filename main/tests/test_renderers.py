@@ -0,0 +1,58 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import uuid4
+from django.http import StreamingHttpResponse
+from main.models import Cart, CartItem, Post
+from main.renderers import FastJSONRenderer
+from main.views import CartItemViewSet
+from model_bakery import baker
+from rest_framework.renderers import JSONRenderer
+import pytest
+
+
+class TestFastJSONRenderer:
+    def test_output_matches_json_renderer(self):
+        data = {
+            'price': Decimal('12.50'),
+            'placed_at': datetime(2023, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+            'local': datetime(2023, 5, 1, 12, 30),
+            'day': date(2023, 5, 1),
+            'ttl': timedelta(days=7),
+            'cart': uuid4(),
+            'rating_histogram': {1: 0, 5: 2},
+            'title': 'Crème brûlée \u2028 \u2029 \U0001F370',
+            'items': [None, True, 1.5, 2 ** 70]
+        }
+
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_indent_falls_back_to_json_renderer(self):
+        data = {'price': Decimal('1.10')}
+
+        rendered = FastJSONRenderer().render(data, 'application/json; indent=2')
+
+        assert rendered == JSONRenderer().render(data, 'application/json; indent=2')
+
+
+@pytest.mark.django_db
+class TestStreamingCartItems:
+    def test_streams_the_same_items_in_chunks(self, user_profile, api_client, monkeypatch):
+        monkeypatch.setattr(CartItemViewSet, 'stream_chunk_size', 2)
+        cart = baker.make(Cart)
+        for index in range(5):
+            baker.make(CartItem, cart=cart, post=baker.make(Post, user=user_profile, title=f'Post {index}'), quantity=index + 1)
+
+        response = api_client.get(f'/main/carts/{cart.id}/items/')
+
+        assert response.status_code == 200
+        assert isinstance(response, StreamingHttpResponse)
+        items = json.loads(b''.join(response.streaming_content))
+        assert [(item['post']['title'], item['quantity']) for item in items] == [(f'Post {index}', index + 1) for index in range(5)]
+
+    def test_empty_cart_streams_an_empty_list(self, api_client):
+        cart = baker.make(Cart)
+
+        response = api_client.get(f'/main/carts/{cart.id}/items/')
+
+        assert b''.join(response.streaming_content) == b'[]'
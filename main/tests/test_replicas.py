@@ -0,0 +1,75 @@
+from django.conf import settings as django_settings
+from main import replicas
+from main.models import Post
+from model_bakery import baker
+import pytest
+
+# The replica tests need a second database aliased 'replica' that is not a
+# test mirror of the primary, e.g. another SQLite file, so rows written to
+# the primary are visible only when a read was routed there.
+requires_replica = pytest.mark.skipif(
+    'replica' not in django_settings.DATABASES,
+    reason="Needs a 'replica' database"
+)
+
+
+@pytest.fixture
+def replica(settings):
+    settings.DATABASE_REPLICAS = ['replica']
+    replicas._health.clear()
+    yield
+    replicas._health.clear()
+
+
+@pytest.fixture
+def post(user_profile):
+    return baker.make(Post, user=user_profile)
+
+
+@requires_replica
+@pytest.mark.django_db(databases=['default', 'replica'])
+class TestReplicaReads:
+    def test_feed_reads_from_the_replica(self, replica, post, api_client):
+        response = api_client.get('/main/posts/')
+
+        assert response.data['count'] == 0
+
+    def test_a_write_pins_the_client_to_the_primary(self, replica, post, api_client):
+        api_client.post('/main/carts/')
+
+        response = api_client.get('/main/posts/')
+
+        assert [item['id'] for item in response.data['results']] == [post.id]
+
+    def test_other_views_read_from_the_primary(self, replica, post, api_client):
+        response = api_client.get(f'/main/userprofiles/{post.user_id}/')
+
+        assert response.data['id'] == post.user_id
+
+
+@pytest.mark.django_db
+def test_unreachable_replica_falls_back_to_the_primary(settings, post, api_client):
+    settings.DATABASE_REPLICAS = ['missing']
+    replicas._health.clear()
+
+    response = api_client.get('/main/posts/')
+
+    assert [item['id'] for item in response.data['results']] == [post.id]
+    assert replicas._health['missing'][1] is False
+
+
+@pytest.mark.django_db
+def test_a_request_reads_from_one_replica(settings, post, api_client, monkeypatch):
+    settings.DATABASE_REPLICAS = ['replica_0', 'replica_1']
+    chosen = []
+
+    def choose_replica():
+        chosen.append('default')
+        # Stands in for a replica in step with the primary
+        return 'default'
+    monkeypatch.setattr(replicas, 'choose_replica', choose_replica)
+
+    response = api_client.get('/main/posts/')
+
+    assert [item['id'] for item in response.data['results']] == [post.id]
+    assert len(chosen) == 1
@@ -0,0 +1,77 @@
+from main.models import Post, Review
+from model_bakery import baker
+import pytest
+
+
+@pytest.fixture
+def make_review():
+    def do_make_review(post, rating):
+        return baker.make(Review, post=post, rating=rating, reviewer_user=baker.make('core.User').userprofile)
+    return do_make_review
+
+
+@pytest.mark.django_db
+class TestRatingAggregates:
+    def test_reviews_update_post_and_seller_aggregates(self, user_profile, make_review):
+        post = baker.make(Post, user=user_profile)
+        other_post = baker.make(Post, user=user_profile)
+
+        make_review(post, 5)
+        changed = make_review(post, 2)
+        deleted = make_review(other_post, 4)
+        changed.rating = 3
+        changed.save()
+        deleted.delete()
+
+        post.refresh_from_db()
+        user_profile.refresh_from_db()
+        assert (post.review_count, post.rating_sum, post.rating_average) == (2, 8, 4.0)
+        assert post.rating_histogram == {1: 0, 2: 0, 3: 1, 4: 0, 5: 1}
+        assert (user_profile.review_count, user_profile.rating_sum) == (2, 8)
+
+    def test_last_review_removed_resets_average(self, user_profile, make_review):
+        post = baker.make(Post, user=user_profile)
+        make_review(post, 4).delete()
+
+        post.refresh_from_db()
+        assert (post.review_count, post.rating_average) == (0, 0)
+
+    def test_saving_a_stale_instance_keeps_new_reviews(self, user_profile, make_review):
+        post = baker.make(Post, user=user_profile)
+        stale_post = Post.objects.get(pk=post.pk)
+        stale_profile = type(user_profile).objects.get(pk=user_profile.pk)
+
+        make_review(post, 5)
+        stale_post.title = 'Burritos'
+        stale_post.save()
+        stale_profile.save()
+
+        post.refresh_from_db()
+        user_profile.refresh_from_db()
+        assert (post.title, post.review_count, post.rating_average) == ('Burritos', 1, 5.0)
+        assert user_profile.review_count == 1
+
+    def test_moving_a_review_updates_both_posts(self, user_profile, make_review):
+        old_post = baker.make(Post, user=user_profile)
+        new_post = baker.make(Post, user=user_profile)
+        review = make_review(old_post, 4)
+        last_update = Post.objects.get(pk=old_post.pk).last_update
+
+        review.post = new_post
+        review.save()
+
+        old_post.refresh_from_db()
+        new_post.refresh_from_db()
+        assert (old_post.review_count, new_post.review_count) == (0, 1)
+        assert old_post.last_update > last_update
+
+    def test_feed_can_be_sorted_by_rating(self, user_profile, make_review, api_client):
+        low = baker.make(Post, user=user_profile)
+        high = baker.make(Post, user=user_profile)
+        make_review(low, 2)
+        make_review(high, 5)
+
+        response = api_client.get('/main/posts/', {'ordering': '-rating_average'})
+
+        assert [post['id'] for post in response.data['results']] == [high.id, low.id]
+        assert response.data['results'][0]['rating_histogram'] == {1: 0, 2: 0, 3: 0, 4: 0, 5: 1}
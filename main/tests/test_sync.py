@@ -0,0 +1,94 @@
+from datetime import timedelta
+from django.utils import timezone
+from main.jobs import PruneTombstonesJob
+from main.models import Ingredient, Post, PostTombstone
+from main.sync import Watermark
+from model_bakery import baker
+from rest_framework import status
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def settled(settings):
+    settings.SYNC_SETTLE_SECONDS = 0
+
+
+@pytest.fixture
+def posts(user_profile):
+    return baker.make(Post, user=user_profile, _quantity=5)
+
+
+def sync(api_client, since=None, page_size=None):
+    params = {}
+    if since is not None:
+        params['since'] = since
+    if page_size is not None:
+        params['page_size'] = page_size
+    response = api_client.get('/main/posts/changes/', params)
+    assert response.status_code == status.HTTP_200_OK
+    return response.data
+
+
+@pytest.mark.django_db
+class TestPostChanges:
+    def test_first_sync_returns_every_post(self, posts, api_client):
+        Post.objects.filter(pk=posts[0].pk).update(sold_out=True)
+
+        data = sync(api_client)
+
+        assert sorted(post['id'] for post in data['posts']) == sorted(post.id for post in posts)
+        assert data['deleted'] == []
+        assert data['has_more'] is False
+
+    def test_pages_cover_every_post_once(self, posts, api_client):
+        ids = []
+        data = sync(api_client, page_size=2)
+        ids += [post['id'] for post in data['posts']]
+        while data['has_more']:
+            data = sync(api_client, data['watermark'], page_size=2)
+            ids += [post['id'] for post in data['posts']]
+
+        assert sorted(ids) == sorted(post.id for post in posts)
+
+    def test_returns_only_changes_and_deletions_since_the_watermark(self, posts, api_client):
+        watermark = sync(api_client)['watermark']
+
+        posts[0].title = 'Burritos'
+        posts[0].save()
+        baker.make(Ingredient, post=posts[1])
+        deleted_id = posts[2].id
+        posts[2].delete()
+        data = sync(api_client, watermark)
+
+        assert [post['id'] for post in data['posts']] == [posts[0].id, posts[1].id]
+        assert data['posts'][0]['title'] == 'Burritos'
+        assert data['deleted'] == [deleted_id]
+        assert sync(api_client, data['watermark'])['posts'] == []
+
+    def test_unsettled_changes_wait_for_the_next_sync(self, posts, api_client, settings):
+        settings.SYNC_SETTLE_SECONDS = 60
+
+        assert sync(api_client)['posts'] == []
+
+    def test_invalid_watermark_returns_400(self, api_client):
+        response = api_client.get('/main/posts/changes/', {'since': 'nonsense'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_watermark_older_than_the_tombstones_returns_410(self, api_client, settings):
+        issued_at = timezone.now() - settings.SYNC_TOMBSTONE_TTL - timedelta(days=1)
+
+        response = api_client.get('/main/posts/changes/', {'since': Watermark(issued_at, 0, issued_at).encode()})
+
+        assert response.status_code == status.HTTP_410_GONE
+
+
+@pytest.mark.django_db
+class TestPruneTombstones:
+    def test_deletes_tombstones_older_than_the_ttl(self, settings):
+        baker.make(PostTombstone, post_id=1, deleted_at=timezone.now() - settings.SYNC_TOMBSTONE_TTL - timedelta(days=1))
+        recent = baker.make(PostTombstone, post_id=2)
+
+        PruneTombstonesJob().run()
+
+        assert list(PostTombstone.objects.values_list('pk', flat=True)) == [recent.pk]
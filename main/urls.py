@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_nested import routers
-from . import views
+from . import async_views, views
 
 router = routers.DefaultRouter()
 
@@ -23,4 +24,13 @@ carts_router.register('items', views.CartItemViewSet, basename='cart-items')
 userprofiles_router = routers.NestedDefaultRouter(router, 'userprofiles', lookup='userprofile')
 userprofiles_router.register('posts', views.UserProfilePostsViewSet, basename='userprofile-posts')
 
-urlpatterns = router.urls + posts_router.urls + carts_router.urls + userprofiles_router.urls
\ No newline at end of file
+urlpatterns = router.urls + posts_router.urls + carts_router.urls + userprofiles_router.urls
+
+if settings.ASYNC_READ_VIEWS:
+    # Matched before the router's routes for the same paths
+    urlpatterns = [
+        path('posts/', async_views.PostListView.as_view()),
+        path('posts/<int:pk>/', async_views.PostDetailView.as_view()),
+        path('categories/', async_views.CategoryListView.as_view()),
+        path('carts/<uuid:pk>/', async_views.CartDetailView.as_view()),
+    ] + urlpatterns
\ No newline at end of file
@@ -1,21 +1,23 @@
+from django.core.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser, DjangoModelPermissions
-from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.mixins import ListModelMixin, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin ,DestroyModelMixin
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework import status
 from .models import Category, Order, OrderItem, Post, Review, Cart, CartItem, UserProfile, PostImage, Ingredient
-from .filters import PostFilter
-from .serializers import AddCartItemSerializer, CartSerializer, CategorySerializer, CreateOrderSerializer, PostImageSerializer, PostSerializer, ReviewSerializer, CartItemSerializer, UpdateCartItemSerializer, UpdateOrderSerializer, UserProfileSerializer, OrderSerializer, PostIngredientSerializer
-from .pagination import DefaultPagination
+from .filters import PostFilter, PostOrderingFilter, PostSearchFilter
+from .serializers import AddCartItemSerializer, BulkPostSerializer, CartSerializer, CategorySerializer, CreateOrderSerializer, PostChangesQuerySerializer, PostImageSerializer, PostSerializer, ReviewSerializer, CartItemSerializer, UpdateCartItemSerializer, UpdateOrderSerializer, UserProfileSerializer, OrderSerializer, PostIngredientSerializer
+from .pagination import FeedPagination, OrderPagination
 from .permissions import IsAdminOrReadOnly, FullDjangoModelPermissions, ViewUserProfileHistoryPermission
-import math
-from django.db.models import Q
-from functools import reduce
+from .cache import CachedResponseMixin, category_cache, post_cache
+from .replicas import ReplicaReadMixin
+from .conditional import ConditionalGetMixin
+from .fast_serializers import FastPostListMixin, FastPostSerializer
+from .renderers import StreamingListMixin
+from . import carts, feed, geo, search, sync
 
 # Create your views here.
 
@@ -41,7 +43,7 @@ class UserProfileViewSet(ModelViewSet):
 
     @action(detail=False, methods=['GET', 'PUT'], permission_classes=[IsAuthenticated])
     def me(self, request):
-        userprofile = UserProfile.objects.get(user_id=request.user.id)
+        userprofile = UserProfile.objects.select_related('user').get(user_id=request.user.id)
         if request.method == 'GET':
             serializer = UserProfileSerializer(userprofile)
             return Response(serializer.data)
@@ -53,15 +55,16 @@ class UserProfileViewSet(ModelViewSet):
 
 
 
-class PostViewSet(ModelViewSet):
+class PostViewSet(ConditionalGetMixin, ReplicaReadMixin, CachedResponseMixin, FastPostListMixin, ModelViewSet):
     # queryset = Post.objects.prefetch_related('images').prefetch_related('ingredients').select_related('user').all()
     serializer_class = PostSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, PostSearchFilter, PostOrderingFilter]
     filterset_class = PostFilter
-    pagination_class = DefaultPagination
+    pagination_class = FeedPagination
     # permission_classes = [IsAdminOrReadOnly]
-    search_fields = ['title', 'description']
-    ordering_fields = ['price', 'last_update', 'ready_date_time']
+    ordering_fields = ['price', 'last_update', 'ready_date_time', 'title', 'distance', 'rating_average', 'review_count']
+    response_cache = post_cache
+    fast_serializer_class = feed.FeedSerializer
 
     # def get_queryset(self):
     #     queryset = Post.objects.all()
@@ -72,7 +75,6 @@ class PostViewSet(ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         data = request.data
-        user = UserProfile.objects.filter(pk=data['user']).first()
         if data['delivery'] == 'true':
             delivery = True
         else:
@@ -81,13 +83,9 @@ class PostViewSet(ModelViewSet):
             pick_up = True
         else:
             pick_up = False
-        new_post = Post.objects.create(title=data['title'], description=data['description'], delivery=delivery, pick_up=pick_up, price=data['price'], ready_date_time=data['ready_date_time'], servings_available=data['servings_available'], location=data['location'], latitude=data['latitude'], longitude=data['longitude'], user=user)
-        new_post.save()
+        new_post = Post.objects.create(title=data['title'], description=data['description'], delivery=delivery, pick_up=pick_up, price=data['price'], ready_date_time=data['ready_date_time'], servings_available=data['servings_available'], location=data['location'], latitude=data['latitude'], longitude=data['longitude'], user_id=data['user'])
+        new_post.categories.add(*data['categories'])
 
-        for category in data['categories']:
-            cat_obj = Category.objects.get(pk=category)
-            new_post.categories.add(cat_obj)
-        
         serializer = PostSerializer(new_post)
 
         return Response(serializer.data)
@@ -98,6 +96,40 @@ class PostViewSet(ModelViewSet):
         # serializer = OrderSerializer(order)
         # return Response(serializer.data)
 
+    @action(detail=False, methods=['POST'], permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        context = self.get_serializer_context()
+        if not request.user.is_staff:
+            context['seller_id'] = UserProfile.objects.values_list('pk', flat=True).get(user=request.user)
+        serializer = BulkPostSerializer(data=request.data, many=True, max_length=500, context=context)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        if any('errors' in result for result in results):
+            return Response(results, status=status.HTTP_207_MULTI_STATUS)
+        return Response(results, status=status.HTTP_201_CREATED)
+
+    @action(detail=False)
+    def changes(self, request):
+        """
+        Posts changed since the ?since= watermark, sold out ones included, and
+        the ids of posts deleted since. Without one, every post. Clients
+        keep the returned watermark for the next call, and call again right
+        away while has_more is true.
+        """
+        query = PostChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        posts, deleted, watermark, has_more = sync.changes(
+            FastPostSerializer.values(Post.objects.all()),
+            query.validated_data.get('since'),
+            query.validated_data['page_size']
+        )
+        return Response({
+            'posts': FastPostSerializer(self.get_serializer_context()).serialize(posts),
+            'deleted': deleted,
+            'watermark': watermark.encode(),
+            'has_more': has_more
+        })
+
     def get_serializer_context(self):
         return {'request': self.request}
 
@@ -107,7 +139,7 @@ class PostViewSet(ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
     def get_queryset(self):
-        queryset = Post.objects.prefetch_related('images').prefetch_related('ingredients').select_related('user').all()
+        queryset = Post.objects.select_related('user__user').prefetch_related('images__variants', 'ingredients', 'categories').all()
 
         lat = self.request.query_params.get('lat')
         lon = self.request.query_params.get('lon')
@@ -120,23 +152,7 @@ class PostViewSet(ModelViewSet):
         search_words = self.request.query_params.get('searchwords')
 
         if (lat is not None) and (lon is not None) and (radius is not None):
-
-            lat = float(lat)
-            lon = float(lon)
-            radius = float(radius)
-
-            R = 3959  #earth's mean radius in miles
-            sin = math.sin
-            cos = math.cos
-            acos = math.acos
-            pi = math.pi
-
-            minLat = lat - radius/R*180/pi
-            maxLat = lat + radius/R*180/pi
-            minLon = lon - radius/R*180/pi / cos(lat*pi/180)
-            maxLon = lon + radius/R*180/pi / cos(lat*pi/180)
-
-            queryset = queryset.filter(latitude__gt=minLat, latitude__lt=maxLat, longitude__gt=minLon, longitude__lt=maxLon)
+            queryset = geo.within_radius(queryset, float(lat), float(lon), float(radius))
 
         if max_price is not None:
             queryset = queryset.filter(price__lte=max_price)
@@ -153,21 +169,24 @@ class PostViewSet(ModelViewSet):
             categories = categories.split(',')
             queryset = queryset.filter(categories__in=categories).distinct()
         if search_words is not None:
-            search_words = search_words.split(',')
-            queryset = queryset.filter(reduce(lambda x, y: x | y, [Q(title__icontains=word) for word in search_words]))
+            queryset = search.search_posts(queryset, search_words.split(','))
+        if self.action == 'list':
+            # The feed only shows posts that can still be ordered
+            queryset = queryset.filter(sold_out=False)
 
 
         return queryset
 
         # For latitudes use: Decimal(8,6), and longitudes use: Decimal(9,6)
         # http://127.0.0.1:8000/main/posts/?lat=34.465037&lon=-110.091227&radius=10
+        # http://127.0.0.1:8000/main/posts/?lat=34.465037&lon=-110.091227&radius=10&ordering=distance
 
 
-class UserProfilePostsViewSet(ModelViewSet):
+class UserProfilePostsViewSet(ReplicaReadMixin, FastPostListMixin, ModelViewSet):
     serializer_class = PostSerializer
 
     def get_queryset(self):
-        return Post.objects.prefetch_related('images').prefetch_related('ingredients').filter(user=self.kwargs['userprofile_pk'])
+        return Post.objects.select_related('user__user').prefetch_related('images__variants', 'ingredients', 'categories').filter(user=self.kwargs['userprofile_pk'])
 
 
 class PostImageViewSet(ModelViewSet):
@@ -177,7 +196,7 @@ class PostImageViewSet(ModelViewSet):
         return {'post_id': self.kwargs['post_pk']}
     
     def get_queryset(self):
-        return PostImage.objects.filter(post_id=self.kwargs['post_pk'])
+        return PostImage.objects.filter(post_id=self.kwargs['post_pk']).prefetch_related('variants')
 
 
 
@@ -193,9 +212,10 @@ class PostIngredientViewSet(ModelViewSet):
 
 
 
-class CategoryViewSet(ModelViewSet):
-    queryset = Category.objects.annotate(posts_count=Count('posts')).all()
+class CategoryViewSet(ConditionalGetMixin, ReplicaReadMixin, CachedResponseMixin, ModelViewSet):
+    queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    response_cache = category_cache
     #permission_classes = [IsAdminOrReadOnly]
 
     # def destroy(self, request, *args, **kwargs):
@@ -212,11 +232,11 @@ class CategoryViewSet(ModelViewSet):
 
 
 
-class ReviewViewSet(ModelViewSet):
+class ReviewViewSet(ReplicaReadMixin, ModelViewSet):
     serializer_class = ReviewSerializer
 
     def get_queryset(self):
-        queryset = Review.objects.all().select_related('post')
+        queryset = Review.objects.all().select_related('post', 'reviewer_user__user')
 
         post_id = self.request.query_params.get('post')
         profile_id = self.request.query_params.get('profile')
@@ -236,13 +256,23 @@ class ReviewViewSet(ModelViewSet):
 
 
 
-class CartViewSet(CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet):
+class CartViewSet(ConditionalGetMixin, CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet):
     serializer_class = CartSerializer
-    queryset = Cart.objects.prefetch_related('items__post').all()
+    queryset = Cart.objects.prefetch_related('items__post__images__variants').all()
 
+    def get_etag(self):
+        # The items as they stand, plus the posts' generation for their prices and images
+        try:
+            items = list(Cart.objects.filter(pk=self.kwargs['pk']).order_by('items__id').values_list('items__id', 'items__post_id', 'items__quantity'))
+        except ValidationError:
+            return None
+        if not items:
+            return None
+        return f'{post_cache.generation()}:{items}'
 
 
-class CartItemViewSet(ModelViewSet):
+
+class CartItemViewSet(StreamingListMixin, ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
 
     def get_serializer_class(self):
@@ -255,17 +285,38 @@ class CartItemViewSet(ModelViewSet):
     def get_queryset(self):
         # cart_id = Cart.objects.only('id').get(uuid=self.kwargs['cart_pk'])
         # return CartItem.objects.filter(cart_id=cart_id).select_related('post')
-        return CartItem.objects.filter(cart_id=self.kwargs['cart_pk']).select_related('post').order_by('post__title')
+        return CartItem.objects.filter(cart_id=self.kwargs['cart_pk']).select_related('post').prefetch_related('post__images__variants').order_by('post__title')
 
     def get_serializer_context(self):
         # cart_id = Cart.objects.only('id').get(uuid=self.kwargs['cart_pk'])
         cart_id = self.kwargs['cart_pk']
         return {'cart_id': cart_id}
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        carts.touch(self.kwargs['cart_pk'])
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        carts.touch(self.kwargs['cart_pk'])
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        carts.touch(self.kwargs['cart_pk'])
+
+    @action(detail=False, methods=['POST'])
+    def batch(self, request, cart_pk):
+        serializer = AddCartItemSerializer(data=request.data, many=True, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        carts.touch(cart_pk)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
 
 class OrderViewSet(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+    pagination_class = OrderPagination
 
     def get_permissions(self):
         if self.request.method in ['PATCH', 'DELETE']:
@@ -276,6 +327,7 @@ class OrderViewSet(ModelViewSet):
         serializer = CreateOrderSerializer(data=request.data, context={'user_id': self.request.user.id})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
+        order = Order.objects.prefetch_related('items__post__images__variants').get(pk=order.pk)
         serializer = OrderSerializer(order)
         return Response(serializer.data)
 
@@ -289,8 +341,10 @@ class OrderViewSet(ModelViewSet):
     def get_queryset(self):
         user = self.request.user
 
+        queryset = Order.objects.prefetch_related('items__post__images__variants')
+
         if user.is_staff:
-            return Order.objects.all()
+            return queryset.order_by('-placed_at')
         
         user_profile_id = UserProfile.objects.only('id').get(user_id=user.id)
-        return Order.objects.filter(user_profile_id=user_profile_id).order_by('-placed_at')
+        return queryset.filter(user_profile_id=user_profile_id).order_by('-placed_at')